@@ -0,0 +1,181 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import F
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.timeline import backfill
+
+
+class ApiViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Lev', last_name='Tolstoy')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='api_slug', description='')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}')
+            for i in range(12)
+        ]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        backfill(cls.reader, cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = {
+            'api:index': reverse('api:index'),
+            'api:group_posts': reverse('api:group_posts',
+                                       args=[self.group.slug]),
+            'api:profile': reverse('api:profile', args=[self.author]),
+            'api:post_detail': reverse('api:post_detail',
+                                       args=[self.post.pk]),
+            'api:post_comments': reverse('api:post_comments',
+                                         args=[self.post.pk]),
+        }
+
+    def test_feeds(self):
+        """Feeds list the newest posts with links to the next page."""
+        for name in ('api:index', 'api:group_posts', 'api:profile'):
+            with self.subTest(name=name):
+                data = self.client.get(self.urls[name]).json()
+                self.assertEqual(len(data['results']), 10)
+                first = data['results'][0]
+                self.assertEqual(first['id'], self.post.pk)
+                self.assertEqual(first['author']['full_name'], 'Lev Tolstoy')
+                self.assertEqual(first['group']['slug'], self.group.slug)
+                self.assertEqual(first['comment_count'], 1)
+                self.assertIsNone(data['previous'])
+                rest = self.client.get(data['next']).json()
+                self.assertEqual(len(rest['results']), 2)
+                self.assertIsNone(rest['next'])
+
+    def test_post_detail_and_comments(self):
+        """A post and its comments are served by their own resources."""
+        data = self.client.get(self.urls['api:post_detail']).json()
+        self.assertEqual(data['text'], self.post.text)
+        self.assertIsNone(data['image'])
+        data = self.client.get(self.urls['api:post_comments']).json()
+        self.assertEqual(data['results'][0]['text'], 'Комментарий')
+
+    def test_follow_feed_needs_login(self):
+        """The subscription feed is a 401 for guests."""
+        url = reverse('api:follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.reader)
+        data = self.client.get(url).json()
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+
+    def test_not_modified(self):
+        """An unchanged resource is a 304 without a body."""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(url)
+                etag = response['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response.content, b'')
+                response = self.client.get(
+                    url,
+                    HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_feed_loads_no_rows(self):
+        """A 304 of a feed loads the ids of the page, not the rows."""
+        url = self.urls['api:index']
+        etag = self.client.get(url)['ETag']
+        # page ids and the last deletion
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_deletion_moves_last_modified(self):
+        """A client revalidating by date alone sees deleted posts go."""
+        Post.objects.update(updated_at=F('updated_at') - timedelta(hours=1))
+        urls = [self.urls['api:index'],
+                reverse('api:changes') + '?since=2000-01-01T00:00:00']
+        modified = [self.client.get(url)['Last-Modified'] for url in urls]
+        Post.objects.filter(pk=self.posts[5].pk).delete()
+        for url, since in zip(urls, modified):
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=since)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_follows_changes(self):
+        """Edits, new comments and new posts change the ETag."""
+        etags = {
+            name: self.client.get(url)['ETag']
+            for name, url in self.urls.items()
+        }
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        Comment.objects.create(post=post, author=self.reader, text='Ещё')
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[name])
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etags[name])
+
+    def test_changes_since(self):
+        """Changed posts come oldest change first, deleted ones by id."""
+        since = Post.objects.get(pk=self.posts[-2].pk).updated_at
+        post = Post.objects.get(pk=self.posts[0].pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        deleted = Post.objects.create(author=self.author, text='Удалённый')
+        deleted_id = deleted.pk
+        deleted.delete()
+        url = reverse('api:changes')
+        data = self.client.get(url, {'since': since.isoformat()}).json()
+        self.assertEqual(
+            [result['id'] for result in data['results']],
+            [self.post.pk, post.pk])
+        self.assertEqual(data['deleted'], [deleted_id])
+        self.assertIsNone(data['next'])
+
+    def test_changes_pages_keep_since(self):
+        """The next page of changes continues after the same date."""
+        url = reverse('api:changes')
+        data = self.client.get(url, {'since': '2000-01-01T00:00:00'}).json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertIn('since=', data['next'])
+        rest = self.client.get(data['next']).json()
+        self.assertEqual(len(rest['results']), 2)
+        self.assertEqual(rest['deleted'], [])
+
+    @override_settings(API_DELETED_PER_PAGE=2)
+    def test_changes_page_deleted_ids(self):
+        """Deleted ids come in pages of their own."""
+        ids = [post.pk for post in self.posts[:3]]
+        for pk in ids:
+            Post.objects.filter(pk=pk).delete()
+        url = reverse('api:changes')
+        data = self.client.get(url, {'since': '2000-01-01T00:00:00'}).json()
+        self.assertEqual(data['deleted'], ids[:2])
+        self.assertIn('since=', data['deleted_next'])
+        rest = self.client.get(data['deleted_next']).json()
+        self.assertEqual(rest['deleted'], ids[2:])
+        self.assertIsNone(rest['deleted_next'])
+
+    def test_changes_need_since(self):
+        """Without a valid date the request is a 400."""
+        url = reverse('api:changes')
+        for query in ({}, {'since': 'вчера'}, {'since': '2020-13-01T00:00'}):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.client.get(url, query).status_code, 400)
@@ -0,0 +1,252 @@
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.db.models import Max
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from posts.exports import parse_timestamp
+from posts.models import DeletedPost, Group, Post, User
+from posts.paginators import CursorPaginator, paginate
+from posts.timeline import timeline_posts
+from posts.views import comment_page
+from users.models import Profile
+
+API_VERSION = 'v1'
+
+
+def serialize_post(request, post):
+    """Fields of a post, with absolute URLs."""
+    thumbnail = None
+    if post.thumbnail:
+        thumbnail = {
+            'url': request.build_absolute_uri(post.thumbnail.url),
+            'width': post.thumbnail_width,
+            'height': post.thumbnail_height,
+        }
+    return {
+        'id': post.pk,
+        'url': request.build_absolute_uri(
+            reverse('api:post_detail', args=[post.pk])),
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': {
+            'username': post.author.username,
+            'full_name': post.author.get_full_name(),
+        },
+        'group': post.group and {
+            'slug': post.group.slug,
+            'title': post.group.title,
+        },
+        'image': (
+            request.build_absolute_uri(post.image.url) if post.image else None
+        ),
+        'thumbnail': thumbnail,
+        'comment_count': post.comment_count,
+        'last_commented_at': (
+            post.last_commented_at and post.last_commented_at.isoformat()),
+        'updated_at': post.updated_at.isoformat(),
+    }
+
+
+def serialize_comment(comment):
+    """Fields of a comment."""
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def page_link(request, name, token):
+    """Absolute URL with a page token, other parameters kept."""
+    if not token:
+        return None
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    query[name] = token
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def page_links(request, page):
+    """Absolute URLs of the neighbour pages."""
+    return {
+        'next': page_link(request, 'after', page.next_token),
+        'previous': page_link(request, 'before', page.previous_token),
+    }
+
+
+def conditional_json(request, version, last_modified, payload):
+    """JSON response with a strong ETag, or 304 if the client has it.
+
+    ``version`` must change whenever the payload would, ``payload`` is
+    only called when the client needs a body.
+    """
+    etag = quote_etag(hashlib.sha1(
+        repr((API_VERSION, request.get_full_path(), version)).encode()
+    ).hexdigest())
+    timestamp = last_modified and timegm(last_modified.utctimetuple())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = JsonResponse(payload())
+    response['ETag'] = etag
+    if timestamp:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def post_version(post):
+    """Moves on every edit of the post and of its counters."""
+    return (post.pk, post.updated_at)
+
+
+def last_change(posts):
+    """Newest updated_at of the posts or deletion of any post.
+
+    A deletion takes a row off a list without moving updated_at of the
+    others, so it moves Last-Modified of every list.
+    """
+    changed = [post.updated_at for post in posts]
+    changed.append(
+        DeletedPost.objects.aggregate(last=Max('deleted_at'))['last'])
+    return max((value for value in changed if value is not None),
+               default=None)
+
+
+def feed_response(request, post_list):
+    """A page of a feed; its ETag is the ids and updated_at of the rows.
+
+    A created or deleted post shifts the rows of the page, an edit or
+    a comment moves updated_at of its row. The page is cut from those
+    columns alone; the full rows are only loaded for a body, not for a
+    304.
+    """
+    page = paginate(request, post_list.select_related(None).only(
+        'pub_date', 'updated_at'))
+
+    def payload():
+        rows = post_list.in_bulk([post.pk for post in page])
+        return {
+            'results': [serialize_post(request, rows[post.pk])
+                        for post in page if post.pk in rows],
+            **page_links(request, page),
+        }
+
+    return conditional_json(
+        request, [post_version(post) for post in page], last_change(page),
+        payload)
+
+
+@require_safe
+def index(request):
+    """Newest posts of every author."""
+    return feed_response(request, Post.objects.feed())
+
+
+@require_safe
+def changes(request):
+    """Posts changed after ``?since=``, oldest change first.
+
+    The first page also lists the ids of the posts deleted since, up to
+    API_DELETED_PER_PAGE of them; ``deleted_next`` links the rest. A
+    client stores updated_at of the last post it has seen and passes
+    it as ``since`` next time.
+    """
+    try:
+        since = parse_timestamp(request.GET.get('since', ''))
+    except ValueError:
+        return JsonResponse(
+            {'error': 'Нужна дата в формате ISO 8601.'}, status=400)
+    page = paginate(
+        request, Post.objects.feed().filter(updated_at__gt=since),
+        ordering=('updated_at', 'pk'))
+    posts = list(page)
+    deleted, deleted_next = [], None
+    if not request.GET.get('after') and not request.GET.get('before'):
+        tombstones = CursorPaginator(
+            DeletedPost.objects.filter(deleted_at__gt=since),
+            settings.API_DELETED_PER_PAGE, ordering=('deleted_at', 'pk'),
+        ).get_cursor_page(after=request.GET.get('deleted_after'))
+        deleted = [tombstone.post_id for tombstone in tombstones]
+        deleted_next = page_link(
+            request, 'deleted_after', tombstones.next_token)
+    return conditional_json(
+        request,
+        ([post_version(post) for post in posts], deleted, deleted_next),
+        last_change(posts),
+        lambda: {
+            'results': [serialize_post(request, post) for post in posts],
+            'deleted': deleted,
+            'deleted_next': deleted_next,
+            **page_links(request, page),
+        })
+
+
+@require_safe
+def group_posts(request, slug):
+    """Newest posts of a group."""
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.community.feed())
+
+
+@require_safe
+def profile(request, username):
+    """Newest posts of an author."""
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.author_posts.feed())
+
+
+@require_safe
+def follow_index(request):
+    """Newest posts of the followed authors."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужна авторизация.'}, status=401)
+    response = feed_response(request, timeline_posts(request.user))
+    response['Vary'] = 'Cookie'
+    return response
+
+
+@require_safe
+def post_detail(request, post_id):
+    """A single post."""
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    return conditional_json(
+        request, post_version(post), post.updated_at,
+        lambda: serialize_post(request, post))
+
+
+@require_safe
+def post_comments(request, post_id):
+    """Comments of a post in the order of writing."""
+    post = get_object_or_404(
+        Post.objects.only('pk', 'updated_at'), pk=post_id)
+    page = comment_page(request, post.pk)
+    comments = list(page)
+    version = (post_version(post), [comment.pk for comment in comments])
+    return conditional_json(
+        request, version, post.updated_at,
+        lambda: {
+            'results': [serialize_comment(comment) for comment in comments],
+            **page_links(request, page),
+        })
+
+
+@require_safe
+def unread_notifications(request):
+    """Number of unread new posts, read from the profile counter."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужна авторизация.'}, status=401)
+    unread = Profile.objects.for_user(request.user).unread_count
+    response = conditional_json(
+        request, (request.user.pk, unread), None,
+        lambda: {'unread': unread})
+    response['Vary'] = 'Cookie'
+    return response
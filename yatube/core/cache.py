@@ -0,0 +1,136 @@
+import os
+import pickle
+import sqlite3
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """Cache in a SQLite file shared by every process on the host.
+
+    LOCATION is the path of the file, created on first use. Writes are
+    single statements or IMMEDIATE transactions, so add() and incr()
+    stay atomic across processes.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    # sets between two culls of the expired and the oldest entries
+    cull_every = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+        self.busy_timeout = params.get('OPTIONS', {}).get('BUSY_TIMEOUT', 5)
+        self._connection = None
+        self._pid = None
+        self._sets = 0
+
+    @property
+    def connection(self):
+        # a connection inherited over fork() must not be shared
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(
+                self.location, timeout=self.busy_timeout,
+                isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)')
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.connection.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires <= ?',
+            [self._key(key, version), self._dumps(value),
+             self.get_backend_timeout(timeout), time.time()])
+        return cursor.rowcount > 0
+
+    def get(self, key, default=None, version=None):
+        row = self.connection.execute(
+            'SELECT value FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [self._key(key, version), time.time()]).fetchone()
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            [self._key(key, version), self._dumps(value),
+             self.get_backend_timeout(timeout)])
+        self._sets += 1
+        if self._sets % self.cull_every == 0:
+            self._cull()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()])
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        cursor = self.connection.execute(
+            'DELETE FROM cache WHERE key = ?', [self._key(key, version)])
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        return self.connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [self._key(key, version), time.time()]).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [key, time.time()]).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                [self._dumps(value), key])
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def _cull(self):
+        connection = self.connection
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', [time.time()])
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count > self._max_entries and self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+        elif count > self._max_entries:
+            # entries that expire first go first, the eternal ones last
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                [count // self._cull_frequency])
@@ -1,8 +1,52 @@
+import shutil
+import tempfile
+from os import path
+
 from django.test import TestCase
 
+from .cache import SQLiteCache
+
 
 class ViewTestClass(TestCase):
     def test_error_page(self):
         response = self.client.get('/strange_page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        params = {'OPTIONS': {'MAX_ENTRIES': 10}}
+        location = path.join(directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(location, params)
+        # a second process opens the same file
+        self.other = SQLiteCache(location, params)
+
+    def test_shared_between_instances(self):
+        self.cache.set('key', {'value': 1}, 60)
+        self.assertEqual(self.other.get('key'), {'value': 1})
+        self.other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_and_incr(self):
+        self.assertTrue(self.cache.add('counter', 1, 60))
+        self.assertFalse(self.other.add('counter', 5, 60))
+        self.assertEqual(self.other.incr('counter', 2), 3)
+        self.assertEqual(self.cache.get('counter'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expiry(self):
+        self.cache.set('key', 'value', 0)
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'new', None))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_cull(self):
+        for i in range(SQLiteCache.cull_every):
+            self.cache.set(f'key{i}', i, 60 + i)
+        self.assertIsNone(self.cache.get('key0'))
+        self.assertEqual(self.cache.get(f'key{SQLiteCache.cull_every - 1}'),
+                         SQLiteCache.cull_every - 1)
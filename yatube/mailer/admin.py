@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.contrib import admin, messages
+from django.utils import timezone
+
+from .models import QueuedMail
+
+
+@admin.register(QueuedMail)
+class QueuedMailAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'subject', 'recipients', 'status', 'attempts',
+                    'created', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    exclude = ('message',)
+    readonly_fields = [field.name for field in QueuedMail._meta.fields
+                       if field.name != 'message']
+    actions = ('retry',)
+    empty_value_display = settings.EMPTY_VALUE_DISPLAY
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        """Queues failed messages again with fresh attempts."""
+        count = queryset.filter(status=QueuedMail.FAILED).update(
+            status=QueuedMail.QUEUED, attempts=0, run_at=timezone.now())
+        self.message_user(
+            request, f'Писем снова в очереди: {count}.', messages.SUCCESS)
+    retry.short_description = 'Отправить заново'
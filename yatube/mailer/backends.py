@@ -0,0 +1,22 @@
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .models import QueuedMail
+from .spool import spool
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Queues messages in the database instead of sending them.
+
+    ``manage.py send_queued_mail`` delivers them with MAILER_BACKEND.
+    """
+
+    def send_messages(self, email_messages):
+        mails = [spool(message) for message in email_messages
+                 if message.recipients()]
+        try:
+            QueuedMail.objects.bulk_create(mails)
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return 0
+        return len(mails)
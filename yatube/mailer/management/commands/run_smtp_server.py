@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from mailer.smtp import LocalSMTPServer
+
+
+class Command(BaseCommand):
+    help = ('Runs a local SMTP stand-in that prints what it receives; '
+            'point EMAIL_HOST and EMAIL_PORT at it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025)
+
+    def handle(self, *args, **options):
+        server = LocalSMTPServer(
+            options['host'], options['port'], on_message=self.show)
+        self.stdout.write(
+            f'SMTP stand-in on {options["host"]}:{server.port}.')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    def show(self, envelope):
+        self.stdout.write(
+            f'{envelope.sender} -> {", ".join(envelope.recipients)}: '
+            f'{len(envelope.data)} bytes')
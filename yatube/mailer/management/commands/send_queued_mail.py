@@ -0,0 +1,75 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from mailer.spool import claim, deliver, queue_depth
+from tasks.queue import worker_name
+
+
+class Command(BaseCommand):
+    help = ('Delivers the queued mail in batches over one connection of '
+            'MAILER_BACKEND and reports latency and queue depth.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no message is due instead of polling.')
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Seconds to wait when no message is due.')
+        parser.add_argument(
+            '--batch', type=int, default=100,
+            help='Messages claimed at once.')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        handlers = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        backend = get_connection(settings.MAILER_BACKEND)
+        try:
+            self.send(backend, options)
+        finally:
+            backend.close()
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+    def send(self, backend, options):
+        sender = worker_name()
+        total = 0
+        while not self.stopping:
+            close_old_connections()
+            mails = claim(sender, options['batch'])
+            if not mails:
+                # no idle connection is held open to the mail server
+                backend.close()
+                if options['burst']:
+                    break
+                time.sleep(options['poll'])
+                continue
+            started = time.perf_counter()
+            sent = deliver(mails, backend)
+            elapsed = time.perf_counter() - started
+            total += len(sent)
+            latencies = sorted(
+                (mail.sent_at - mail.created).total_seconds()
+                for mail in sent)
+            report = (f'{len(sent)} of {len(mails)} sent in '
+                      f'{elapsed * 1000:.0f} ms')
+            if latencies:
+                report += (
+                    f', latency median {latencies[len(latencies) // 2]:.1f}'
+                    f' s, max {latencies[-1]:.1f} s')
+            self.stdout.write(f'{report}, {queue_depth()} queued')
+        self.stdout.write(self.style.SUCCESS(
+            f'Sender {sender} stopped: {total} sent, '
+            f'{queue_depth()} queued.'))
+
+    def stop(self, signum, frame):
+        """Finishes the batch, then exits."""
+        self.stopping = True
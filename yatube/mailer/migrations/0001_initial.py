@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:04
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedMail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_email', models.CharField(max_length=255, verbose_name='sender')),
+                ('recipients', models.TextField(verbose_name='recipients')),
+                ('subject', models.CharField(blank=True, max_length=255, verbose_name='subject')),
+                ('message', models.BinaryField(verbose_name='message')),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('sending', 'sending'), ('sent', 'sent'), ('failed', 'failed')], default='queued', max_length=16, verbose_name='status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='attempts')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='not before')),
+                ('locked_by', models.CharField(blank=True, max_length=255, verbose_name='sender process')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='lease end')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='time of creation')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='time of sending')),
+            ],
+            options={
+                'verbose_name': 'queued mail',
+                'verbose_name_plural': 'queued mail',
+                'db_table': 'mail queue',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='queuedmail',
+            index=models.Index(fields=['status', 'run_at'], name='mail_status_run_at'),
+        ),
+    ]
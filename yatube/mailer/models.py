@@ -0,0 +1,44 @@
+from django.db import models
+from django.utils import timezone
+
+
+class QueuedMail(models.Model):
+    """Message accepted by the queued backend, waiting for the sender."""
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'queued'),
+        (SENDING, 'sending'),
+        (SENT, 'sent'),
+        (FAILED, 'failed'),
+    )
+    from_email = models.CharField('sender', max_length=255)
+    # JSON list of every recipient, Bcc included
+    recipients = models.TextField('recipients')
+    subject = models.CharField('subject', max_length=255, blank=True)
+    # the MIME message as it is delivered
+    message = models.BinaryField('message')
+    status = models.CharField(
+        'status', max_length=16, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField('attempts', default=0)
+    run_at = models.DateTimeField('not before', default=timezone.now)
+    locked_by = models.CharField('sender process', max_length=255,
+                                 blank=True)
+    locked_until = models.DateTimeField('lease end', null=True, blank=True)
+    last_error = models.TextField('last error', blank=True)
+    created = models.DateTimeField('time of creation', auto_now_add=True)
+    sent_at = models.DateTimeField('time of sending', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'queued mail'
+        verbose_name_plural = 'queued mail'
+        db_table = 'mail queue'
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='mail_status_run_at'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} #{self.pk}'
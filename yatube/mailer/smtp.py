@@ -0,0 +1,118 @@
+import socketserver
+import threading
+from collections import namedtuple
+from email import message_from_bytes
+
+Envelope = namedtuple('Envelope', 'sender recipients data')
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """One SMTP session: enough of RFC 5321 for smtplib, no extensions.
+
+    Every command is handled by the method of its name.
+    """
+
+    def reply(self, code, text):
+        self.wfile.write(f'{code} {text}\r\n'.encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply(220, 'localhost SMTP stand-in')
+        self.sender, self.recipients = None, []
+        for line in self.rfile:
+            command, _, argument = line.decode(
+                'utf-8', 'replace').rstrip('\r\n').partition(' ')
+            handler = getattr(self, f'smtp_{command.upper()}', None)
+            if handler is None:
+                self.reply(502, 'Command not implemented')
+            elif handler(argument) is False:
+                return
+
+    def smtp_HELO(self, argument):
+        self.reply(250, 'localhost')
+
+    smtp_EHLO = smtp_HELO
+
+    def smtp_MAIL(self, argument):
+        self.sender, self.recipients = address(argument), []
+        self.reply(250, 'OK')
+
+    def smtp_RCPT(self, argument):
+        recipient = address(argument)
+        if recipient in self.server.refused:
+            self.reply(550, 'Mailbox unavailable')
+            return
+        self.recipients.append(recipient)
+        self.reply(250, 'OK')
+
+    def smtp_DATA(self, argument):
+        self.reply(354, 'End data with <CR><LF>.<CR><LF>')
+        lines = []
+        for line in self.rfile:
+            if line == b'.\r\n':
+                break
+            # the client doubled the dots that start a line
+            lines.append(line[1:] if line.startswith(b'.') else line)
+        self.server.received(
+            Envelope(self.sender, self.recipients, b''.join(lines)))
+        self.smtp_RSET(argument)
+
+    def smtp_RSET(self, argument):
+        self.sender, self.recipients = None, []
+        self.reply(250, 'OK')
+
+    def smtp_NOOP(self, argument):
+        self.reply(250, 'OK')
+
+    def smtp_QUIT(self, argument):
+        self.reply(221, 'Bye')
+        return False
+
+
+def address(argument):
+    """The address of a 'FROM:<a@b>' or 'TO:<a@b>' argument."""
+    return argument.partition(':')[2].strip().lstrip('<').partition('>')[0]
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """SMTP server keeping what it receives, for tests and development.
+
+    As a context manager it serves from a thread on a free port:
+
+        with LocalSMTPServer() as server:
+            ... EMAIL_PORT=server.port ...
+        server.messages
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, refused=(), on_message=None):
+        super().__init__((host, port), SMTPHandler)
+        self.refused = set(refused)
+        self.on_message = on_message
+        self.envelopes = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    @property
+    def messages(self):
+        return [message_from_bytes(envelope.data)
+                for envelope in self.envelopes]
+
+    def received(self, envelope):
+        with self.lock:
+            self.envelopes.append(envelope)
+        if self.on_message is not None:
+            self.on_message(envelope)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,119 @@
+import json
+import traceback
+from datetime import timedelta
+from email import message_from_bytes
+from email.message import Message
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from tasks.queue import backoff
+
+from .models import QueuedMail
+
+
+def spool(email_message):
+    """The queue row of a message, to be saved by the caller."""
+    return QueuedMail(
+        from_email=email_message.from_email,
+        recipients=json.dumps(email_message.recipients()),
+        subject=email_message.subject[:255],
+        message=email_message.message().as_bytes(),
+    )
+
+
+class SpooledMIME(Message):
+    """Stored MIME message, flattened with the line ends a backend asks
+    for like the messages of django.core.mail."""
+
+    def as_bytes(self, unixfrom=False, linesep='\n'):
+        return super().as_bytes(
+            unixfrom, policy=self.policy.clone(linesep=linesep))
+
+
+class SpooledMessage(EmailMessage):
+    """EmailMessage of a queue row, for any delivery backend."""
+
+    def __init__(self, mail):
+        super().__init__(
+            subject=mail.subject, from_email=mail.from_email,
+            to=json.loads(mail.recipients))
+        self.mail = mail
+
+    def message(self):
+        return message_from_bytes(bytes(self.mail.message),
+                                  _class=SpooledMIME)
+
+
+def due(now):
+    """Queued messages whose time has come and those of lost senders."""
+    return (Q(status=QueuedMail.QUEUED, run_at__lte=now)
+            | Q(status=QueuedMail.SENDING, locked_until__lt=now))
+
+
+def claim(sender, limit):
+    """Leases up to ``limit`` due messages to the sender, oldest first.
+
+    Works like tasks.queue.claim: SKIP LOCKED where the database has it,
+    a single UPDATE on SQLite.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = QueuedMail.objects.filter(due(now)).order_by(
+            'run_at', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            ids = list(candidates.select_for_update(skip_locked=True)
+                       .values_list('pk', flat=True)[:limit])
+        else:
+            ids = candidates.values('pk')[:limit]
+        QueuedMail.objects.filter(due(now), pk__in=ids).update(
+            status=QueuedMail.SENDING,
+            locked_by=sender,
+            locked_until=now + timedelta(seconds=settings.MAILER_LEASE),
+            attempts=F('attempts') + 1,
+        )
+        return list(QueuedMail.objects.filter(
+            status=QueuedMail.SENDING, locked_by=sender,
+            locked_until__gt=now).order_by('run_at', 'pk'))
+
+
+def deliver(mails, backend):
+    """Sends claimed messages over the open connection of a backend.
+
+    Every message is marked sent as soon as it is, so a crash never sends
+    it again. A message that fails is retried later or given up; the
+    connection is opened again for the next one. Returns the sent
+    messages.
+    """
+    sent = []
+    for mail in mails:
+        try:
+            backend.open()
+            backend.send_messages([SpooledMessage(mail)])
+        except Exception:
+            backend.close()
+            error = traceback.format_exc()
+            if mail.attempts < settings.MAILER_MAX_ATTEMPTS:
+                QueuedMail.objects.filter(pk=mail.pk).update(
+                    status=QueuedMail.QUEUED, last_error=error,
+                    locked_until=None, run_at=timezone.now() + timedelta(
+                        seconds=backoff(mail.attempts)))
+            else:
+                QueuedMail.objects.filter(pk=mail.pk).update(
+                    status=QueuedMail.FAILED, last_error=error,
+                    locked_until=None)
+            continue
+        mail.sent_at = timezone.now()
+        QueuedMail.objects.filter(pk=mail.pk).update(
+            status=QueuedMail.SENT, locked_until=None, sent_at=mail.sent_at)
+        sent.append(mail)
+    return sent
+
+
+def queue_depth():
+    """Messages waiting for a sender, due or not."""
+    return QueuedMail.objects.filter(
+        status__in=(QueuedMail.QUEUED, QueuedMail.SENDING)).count()
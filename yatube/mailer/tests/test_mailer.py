@@ -0,0 +1,126 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMessage, send_mass_mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import QueuedMail
+from ..smtp import LocalSMTPServer
+
+User = get_user_model()
+
+
+class CrashingBackend(EmailBackend):
+    """Delivers one message, then the process dies."""
+
+    def send_messages(self, messages):
+        if mail.outbox:
+            raise SystemExit
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='mailer.backends.QueuedEmailBackend',
+                   MAILER_BACKEND='django.core.mail.backends.locmem.'
+                                  'EmailBackend')
+class QueuedMailTests(TestCase):
+    def send(self, **options):
+        out = StringIO()
+        call_command('send_queued_mail', burst=True, stdout=out, **options)
+        return out.getvalue()
+
+    def test_password_reset_only_queues_the_mail(self):
+        """The request stores the mail, the sender delivers it."""
+        User.objects.create_user(username='forgetful',
+                                 email='forgetful@example.com',
+                                 password='Forgotten-42')
+        response = Client().post(reverse('users:password_reset_form'),
+                                 {'email': 'forgetful@example.com'})
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(mail.outbox, [])
+        queued = QueuedMail.objects.get()
+        self.assertEqual(
+            (queued.recipients, queued.status),
+            ('["forgetful@example.com"]', QueuedMail.QUEUED))
+        out = self.send()
+        self.assertIn('1 of 1 sent', out)
+        self.assertEqual(mail.outbox[0].to, ['forgetful@example.com'])
+        self.assertIn(
+            '/auth/reset/',
+            mail.outbox[0].message().get_payload(decode=True).decode())
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, QueuedMail.SENT)
+
+    def test_batch_is_sent_over_one_smtp_connection(self):
+        """The sender reuses its connection and reports the queue."""
+        send_mass_mail([
+            (f'Письмо {number}', 'Текст.\n.точка', 'blog@example.com',
+             [f'reader{number}@example.com'])
+            for number in range(3)
+        ])
+        EmailMessage('Скрытое', 'Текст', 'blog@example.com',
+                     ['open@example.com'],
+                     bcc=['hidden@example.com']).send()
+        with LocalSMTPServer() as server:
+            with self.settings(
+                    MAILER_BACKEND='django.core.mail.backends.smtp.'
+                                   'EmailBackend',
+                    EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.port):
+                out = self.send(batch=10)
+        self.assertIn('4 of 4 sent', out)
+        self.assertIn('0 queued', out)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(
+            [envelope.recipients for envelope in server.envelopes],
+            [['reader0@example.com'], ['reader1@example.com'],
+             ['reader2@example.com'],
+             ['open@example.com', 'hidden@example.com']])
+        first = server.messages[0]
+        self.assertEqual(
+            first.get_payload(decode=True).decode().splitlines(),
+            ['Текст.', '.точка'])
+        self.assertNotIn('hidden@example.com', server.messages[3].as_string())
+
+    @override_settings(MAILER_MAX_ATTEMPTS=2)
+    def test_refused_mail_is_retried_then_given_up(self):
+        """A refused message waits for a retry; others are still sent."""
+        for recipient in ('bounce@example.com', 'ok@example.com'):
+            EmailMessage('Тема', 'Текст', 'blog@example.com',
+                         [recipient]).send()
+        with LocalSMTPServer(refused=['bounce@example.com']) as server:
+            with self.settings(
+                    MAILER_BACKEND='django.core.mail.backends.smtp.'
+                                   'EmailBackend',
+                    EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.port):
+                self.assertIn('1 of 2 sent', self.send())
+                bounced = QueuedMail.objects.get(
+                    recipients='["bounce@example.com"]')
+                self.assertEqual(
+                    (bounced.status, bounced.attempts),
+                    (QueuedMail.QUEUED, 1))
+                self.assertIn('SMTPRecipientsRefused', bounced.last_error)
+                QueuedMail.objects.filter(pk=bounced.pk).update(
+                    run_at=bounced.created)
+                self.send()
+        self.assertEqual(
+            [envelope.recipients for envelope in server.envelopes],
+            [['ok@example.com']])
+        bounced.refresh_from_db()
+        self.assertEqual(bounced.status, QueuedMail.FAILED)
+
+    def test_crash_keeps_what_was_sent(self):
+        """Messages delivered before a crash are not sent again."""
+        for number in range(2):
+            EmailMessage('Тема', 'Текст', 'blog@example.com',
+                         [f'reader{number}@example.com']).send()
+        with self.settings(
+                MAILER_BACKEND='mailer.tests.test_mailer.CrashingBackend'):
+            with self.assertRaises(SystemExit):
+                self.send()
+        self.assertEqual(
+            list(QueuedMail.objects.order_by('pk').values_list(
+                'status', flat=True)),
+            [QueuedMail.SENT, QueuedMail.SENDING])
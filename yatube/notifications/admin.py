@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from posts.admin import LargeTableAdmin
+
+from .models import Notification
+
+
+@admin.register(Notification)
+class NotificationAdmin(LargeTableAdmin):
+    list_display = ('pk', 'user', 'post', 'created', 'read', 'digested')
+    list_filter = ('read', 'digested')
+    list_select_related = ('user', 'post')
+    raw_id_fields = ('user', 'post')
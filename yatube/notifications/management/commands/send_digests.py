@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from notifications.models import Notification
+from notifications.notify import send_digests
+
+
+class Command(BaseCommand):
+    help = ('Queues a digest mail of the unread new posts for every user '
+            'with new notifications; run it periodically, e.g. hourly '
+            'from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Users handled per transaction.')
+
+    def handle(self, *args, **options):
+        last_user = 0
+        users = sent = 0
+        while True:
+            batch = list(
+                Notification.objects.filter(
+                    digested=False, user_id__gt=last_user)
+                .order_by('user_id').values_list('user_id', flat=True)
+                .distinct()[:options['batch_size']])
+            if not batch:
+                break
+            last_user = batch[-1]
+            sent += send_digests(batch)
+            users += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Digests queued: {sent} for {users} users.'))
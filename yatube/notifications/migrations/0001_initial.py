@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0022_moderation_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='time of creation')),
+                ('read', models.BooleanField(default=False, verbose_name='read')),
+                ('digested', models.BooleanField(default=False, verbose_name='digested')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='posts.Post', verbose_name='new post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL, verbose_name='recipient')),
+            ],
+            options={
+                'verbose_name': 'notification',
+                'db_table': 'notifications',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'read'], name='notification_user_read'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['digested', 'user'], name='notification_digested_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_notification'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import models
+
+from posts.models import Post, User
+
+
+class Notification(models.Model):
+    """A new post of an author the user follows."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='recipient',
+        related_name='notifications')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='new post',
+        related_name='notifications')
+    created = models.DateTimeField('time of creation', auto_now_add=True)
+    read = models.BooleanField('read', default=False)
+    # sent in a digest or read before one was due
+    digested = models.BooleanField('digested', default=False)
+
+    class Meta:
+        verbose_name = 'notification'
+        db_table = 'notifications'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_notification'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'read'],
+                         name='notification_user_read'),
+            models.Index(fields=['digested', 'user'],
+                         name='notification_digested_user'),
+        ]
+
+    def __str__(self):
+        return f'{self.post} for {self.user}'
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Max
+from django.template.loader import render_to_string
+
+from posts.models import Follow, Post
+from tasks.queue import task
+from users.models import Profile
+
+from .models import Notification
+
+
+@task(timeout=60 * 60)
+def notify_followers(post_id):
+    """Records the new post for every follower of its author.
+
+    Followers are handled in keyset batches, one transaction each; a
+    retried task skips the followers already notified, so the unread
+    counters move once per notification.
+    """
+    post = Post.objects.filter(pk=post_id).only('author_id').first()
+    if post is None:
+        return
+    follows = Follow.objects.filter(author_id=post.author_id).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(follows.filter(pk__gt=last_pk).values_list(
+            'pk', 'user_id')[:settings.NOTIFICATION_BATCH_SIZE])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        with transaction.atomic():
+            notified = set(Notification.objects.filter(
+                post_id=post_id, user_id__in=[user for _, user in batch])
+                .values_list('user_id', flat=True))
+            users = [user for _, user in batch if user not in notified]
+            Notification.objects.bulk_create(
+                Notification(user_id=user, post_id=post_id)
+                for user in users)
+            Profile.objects.bump_many(users, 'unread_count')
+
+
+def mark_read(user):
+    """Marks every notification of the user read and moves the counter.
+
+    A single UPDATE when there is nothing new, as on most page views.
+    """
+    read = Notification.objects.filter(user=user, read=False).update(
+        read=True)
+    if read:
+        Profile.objects.bump(user.pk, 'unread_count', -read)
+    return read
+
+
+def digest_messages(notifications):
+    """One digest mail per user with an email, from unread notifications
+    ordered by user."""
+    by_user = {}
+    for notification in notifications:
+        by_user.setdefault(notification.user, []).append(notification.post)
+    limit = settings.NOTIFICATION_DIGEST_LIMIT
+    return [
+        EmailMessage(
+            subject=f'Новые посты: {len(posts)}',
+            body=render_to_string('notifications/digest_email.txt', {
+                'user': user,
+                'posts': posts[:limit],
+                'more': max(len(posts) - limit, 0),
+                'site_url': settings.SITE_URL,
+            }),
+            to=[user.email],
+        )
+        for user, posts in by_user.items() if user.email
+    ]
+
+
+def send_digests(user_ids):
+    """Queues the digests of the users and marks their notifications."""
+    with transaction.atomic():
+        pending = Notification.objects.filter(
+            user_id__in=user_ids, digested=False)
+        # notifications recorded meanwhile wait for the next digest
+        last_pk = pending.aggregate(last=Max('pk'))['last'] or 0
+        pending = pending.filter(pk__lte=last_pk)
+        unread = list(
+            pending.filter(read=False)
+            .select_related('user', 'post__author')
+            .order_by('user_id', '-post__pub_date'))
+        messages = digest_messages(unread)
+        pending.update(digested=True)
+        # the queued backend only stores them in this transaction
+        get_connection().send_messages(messages)
+    return len(messages)
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from posts.models import Follow, Post
+from users.models import Profile
+
+from .models import Notification
+from .notify import notify_followers
+
+
+@receiver(post_save, sender=Post)
+def notify_about_created_post(sender, instance, created, **kwargs):
+    """Queues the notifications of the followers of the author."""
+    if created and Follow.objects.filter(
+            author_id=instance.author_id).exists():
+        notify_followers.delay(instance.pk)
+
+
+@receiver(pre_delete, sender=Post)
+def uncount_deleted_post(sender, instance, **kwargs):
+    """Takes the unread notifications of the post off the counters."""
+    users = Notification.objects.filter(
+        post=instance, read=False).values_list('user_id', flat=True)
+    Profile.objects.bump_many(list(users), 'unread_count', -1)
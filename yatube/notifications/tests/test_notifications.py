@@ -0,0 +1,121 @@
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Post, User
+from tasks.models import Task
+from users.models import Profile
+
+from ..models import Notification
+from ..notify import notify_followers
+
+
+class NotificationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой')
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com')
+        cls.quiet = User.objects.create_user(username='quiet')
+        cls.stranger = User.objects.create_user(username='stranger')
+        for user in (cls.reader, cls.quiet):
+            Follow.objects.create(user=user, author=cls.author)
+        for user in (cls.author, cls.reader, cls.quiet, cls.stranger):
+            Profile.objects.for_user(user)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def unread(self, user):
+        return Profile.objects.for_user(user).unread_count
+
+    def publish(self, text='Новая глава'):
+        post = Post.objects.create(author=self.author, text=text)
+        call_command('run_tasks', burst=True, stdout=StringIO())
+        return post
+
+    def test_new_post_notifies_followers(self):
+        """A worker records the post for every follower of the author."""
+        post = Post.objects.create(author=self.author, text='Глава')
+        self.assertEqual(
+            Task.objects.values_list('name', flat=True).get(),
+            'notifications.notify.notify_followers')
+        call_command('run_tasks', burst=True, stdout=StringIO())
+        self.assertEqual(
+            set(post.notifications.values_list('user__username', flat=True)),
+            {'reader', 'quiet'})
+        self.assertEqual(
+            [self.unread(user)
+             for user in (self.reader, self.quiet, self.stranger)],
+            [1, 1, 0])
+
+    def test_posts_without_followers_queue_nothing(self):
+        Post.objects.create(author=self.stranger, text='Никому')
+        self.assertFalse(Task.objects.exists())
+
+    def test_retried_task_counts_once(self):
+        """A task run twice neither duplicates nor recounts."""
+        post = self.publish()
+        notify_followers(post.pk)
+        self.assertEqual(post.notifications.count(), 2)
+        self.assertEqual(self.unread(self.reader), 1)
+
+    def test_unread_endpoint_reads_the_counter(self):
+        """The count comes from the profile, not from the notifications."""
+        self.publish()
+        self.publish('Ещё глава')
+        url = reverse('api:unread_notifications')
+        # session, user and profile
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.json(), {'unread': 2})
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(Client().get(url).status_code, 401)
+
+    def test_follow_page_marks_posts_read(self):
+        """Opening the subscription feed resets the counter."""
+        self.publish()
+        self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(self.unread(self.reader), 0)
+        self.assertEqual(self.unread(self.quiet), 1)
+        self.assertEqual(
+            self.client.get(reverse('api:unread_notifications')).json(),
+            {'unread': 0})
+
+    def test_deleted_post_leaves_the_counters(self):
+        post = self.publish()
+        post.delete()
+        self.assertEqual(self.unread(self.reader), 0)
+
+    def test_digest_lists_unread_posts_once(self):
+        """One mail per user with an email; read posts are left out."""
+        self.publish('Первая глава')
+        self.client.get(reverse('posts:follow_index'))
+        post = self.publish('Вторая глава')
+        out = StringIO()
+        call_command('send_digests', stdout=out)
+        self.assertIn('Digests queued: 1 for 2 users', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        digest = mail.outbox[0]
+        self.assertEqual(digest.to, ['reader@example.com'])
+        self.assertIn('Лев Толстой: Вторая глава', digest.body)
+        self.assertIn(reverse('posts:post_detail', args=[post.pk]),
+                      digest.body)
+        self.assertNotIn('Первая глава', digest.body)
+        self.assertFalse(
+            Notification.objects.filter(digested=False).exists())
+        call_command('send_digests', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_rebuild_counters_restores_unread_count(self):
+        self.publish()
+        Profile.objects.filter(user=self.reader).update(unread_count=7)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(self.unread(self.reader), 1)
@@ -1,11 +1,73 @@
+import json
+
+from django import forms
 from django.conf import settings
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.shortcuts import render
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .moderation import queue_job, run_job
+from .models import Comment, Follow, Group, ModerationJob, Post
+from .paginators import EstimatedCountPaginator
+from .search import search_posts
+
+
+class MoveToGroupForm(forms.Form):
+    group = forms.ModelChoiceField(
+        Group.objects.order_by('title'), label='Группа')
+
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """Autocomplete showing the object its row has already loaded."""
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = self.selected
+        if selected is None or [str(selected.pk)] != list(map(str, value)):
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name, selected.pk,
+            self.choices.field.label_from_instance(selected), True,
+            len(options)))
+        return [(None, options, 0)]
+
+
+class LoadedRelationsForm(forms.ModelForm):
+    """Changelist row: autocompletes take the list_select_related rows."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field in self.fields.items():
+            widget = getattr(field.widget, 'widget', field.widget)
+            if isinstance(widget, LoadedAutocompleteSelect):
+                widget.selected = getattr(self.instance, name)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist of a large table: no full COUNT(*), no query per row."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
-from .models import Comment, Follow, Group, Post
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = LoadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', LoadedRelationsForm)
+        return super().get_changelist_form(request, **kwargs)
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdmin):
     """Сustom admin panel for Post."""
     list_display = (
         'pk',
@@ -18,18 +80,119 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
+    list_select_related = ('author', 'group')
+    # a row renders its group, not a <select> of every group
+    autocomplete_fields = ('author', 'group')
+    # bounded pub_date ranges, walked on the post_pub_date index
+    date_hierarchy = 'pub_date'
+    actions = ('delete_author_posts', 'move_to_group')
+
+    def get_search_results(self, request, queryset, search_term):
+        """Looks the text up in the search index, not with LIKE."""
+        if not search_term:
+            return queryset, False
+        found = search_posts(search_term, comments=False)
+        return queryset.filter(pk__in=found.values('pk')), False
+
+    def jobs_queued(self, request, count):
+        self.message_user(request, format_html(
+            'Задач поставлено в очередь: {}. Ход выполнения — в '
+            '<a href="{}">задачах модерации</a>.',
+            count, reverse('admin:posts_moderationjob_changelist')),
+            messages.SUCCESS)
+
+    def delete_author_posts(self, request, queryset):
+        """Queues a job per author that deletes all of their posts."""
+        authors = queryset.order_by().values_list(
+            'author_id', flat=True).distinct()
+        for author_id in authors:
+            queue_job(
+                action=ModerationJob.DELETE_AUTHOR_POSTS,
+                author_id=author_id,
+                total=Post.objects.filter(author_id=author_id).count(),
+                created_by=request.user)
+        self.jobs_queued(request, len(authors))
+    delete_author_posts.short_description = (
+        'Удалить все посты авторов выбранных постов')
+    delete_author_posts.allowed_permissions = ('delete',)
+
+    def move_to_group(self, request, queryset):
+        """Asks for a group, then queues a job moving the posts."""
+        form = MoveToGroupForm(request.POST if 'apply' in request.POST
+                               else None)
+        if form.is_valid():
+            post_ids = list(queryset.order_by('pk').values_list(
+                'pk', flat=True))
+            queue_job(
+                action=ModerationJob.MOVE_TO_GROUP,
+                group=form.cleaned_data['group'],
+                post_ids=json.dumps(post_ids),
+                total=len(post_ids),
+                created_by=request.user)
+            self.jobs_queued(request, 1)
+            return None
+        select_across = request.POST.get('select_across') in ('1', 'True')
+        return render(request, 'admin/posts/post/move_to_group.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'count': queryset.count(),
+            'select_across': int(select_across),
+            'selected': ([] if select_across else
+                         request.POST.getlist(helpers.ACTION_CHECKBOX_NAME)),
+        })
+    move_to_group.short_description = 'Перенести выбранные посты в группу'
+    move_to_group.allowed_permissions = ('change',)
 
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
-    pass
+    list_display = ('pk', 'title', 'slug')
+    search_fields = ('title', 'slug')
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
-    pass
+class CommentAdmin(LargeTableAdmin):
+    list_display = ('pk', 'text', 'post', 'author', 'created')
+    list_select_related = ('post', 'author')
+    raw_id_fields = ('post', 'author')
+    empty_value_display = settings.EMPTY_VALUE_DISPLAY
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
-    pass
+class FollowAdmin(LargeTableAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+
+
+@admin.register(ModerationJob)
+class ModerationJobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'action', 'author', 'group', 'status',
+                    'progress', 'total', 'created_by', 'created',
+                    'finished_at')
+    list_filter = ('status', 'action')
+    list_select_related = ('author', 'group', 'created_by')
+    readonly_fields = [field.name for field in ModerationJob._meta.fields]
+    actions = ('requeue',)
+    empty_value_display = settings.EMPTY_VALUE_DISPLAY
+
+    def has_add_permission(self, request):
+        return False
+
+    def progress(self, job):
+        return f'{job.processed} / {job.total} ({job.progress}%)'
+    progress.short_description = 'Выполнено'
+
+    def requeue(self, request, queryset):
+        """Runs failed jobs again from their last chunk."""
+        jobs = list(queryset.filter(status=ModerationJob.FAILED)
+                    .values_list('pk', flat=True))
+        ModerationJob.objects.filter(pk__in=jobs).update(
+            status=ModerationJob.QUEUED, error='')
+        for job_id in jobs:
+            run_job.delay(job_id)
+        self.message_user(
+            request, f'Задач снова в очереди: {len(jobs)}.',
+            messages.SUCCESS)
+    requeue.short_description = 'Перезапустить с места остановки'
@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+
+from django.db.models import Max
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Lets bulk_create keep given dates of auto_now(_add) fields."""
+    flags = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in flags:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def bulk_insert(model, objs, key):
+    """bulk_create() that leaves the pk on every object on any database.
+
+    Where the insert returns no ids, the new rows are matched back to
+    the objects by the ``key`` fields among the rows above the largest
+    pk before the insert, equal keys in insertion order. Rows inserted
+    meanwhile by others have other keys and are skipped.
+    """
+    objs = list(objs)
+    floor = model.objects.aggregate(last=Max('pk'))['last'] or 0
+    model.objects.bulk_create(objs)
+    if not objs or objs[0].pk is not None:
+        return objs
+    pending = {}
+    for obj in objs:
+        pending.setdefault(
+            tuple(getattr(obj, field) for field in key), []).append(obj)
+    rows = model.objects.filter(pk__gt=floor).order_by('pk').values_list(
+        'pk', *key)
+    for pk, *values in rows.iterator():
+        matches = pending.get(tuple(values))
+        if matches:
+            matches.pop(0).pk = pk
+    if any(pending.values()):
+        raise RuntimeError(
+            f'Inserted {model._meta.verbose_name} rows not found.')
+    return objs
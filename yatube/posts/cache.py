@@ -0,0 +1,214 @@
+import math
+import random
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Follow
+
+GENERATION_KEY = 'feed_generation:{}'
+FOLLOW_KEY = 'follows:{}:{}'
+LOCK_KEY = 'lock:{}'
+METRICS_KEY = 'cache_metrics:{}:{}'
+METRICS_PREFIXES_KEY = 'cache_metrics'
+# hit: fresh value; early: recomputed before expiry; stale: expired value
+# served during another worker's recompute; wait: waited for that
+# recompute; miss: computed because nothing usable was cached
+METRIC_EVENTS = ('hit', 'early', 'stale', 'wait', 'miss')
+# seconds between two flushes of the local counters to the shared cache
+METRICS_FLUSH_INTERVAL = 5
+WAIT_INTERVAL = 0.05
+
+_metrics = Counter()
+_metrics_prefixes = set()
+_metrics_flushed = time.monotonic()
+_metrics_lock = threading.Lock()
+
+
+def _incr(key, delta):
+    """incr() that creates a missing key, whoever gets there first."""
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def count(prefix, event):
+    """Counts a read_through() event, flushed every few seconds."""
+    with _metrics_lock:
+        _metrics[prefix, event] += 1
+        due = time.monotonic() - _metrics_flushed >= METRICS_FLUSH_INTERVAL
+    if due:
+        flush_metrics()
+
+
+def flush_metrics():
+    """Adds the counters of this process to the shared ones."""
+    global _metrics_flushed
+    with _metrics_lock:
+        pending = dict(_metrics)
+        _metrics.clear()
+        _metrics_flushed = time.monotonic()
+    prefixes = {prefix for prefix, _ in pending}
+    if not prefixes <= _metrics_prefixes:
+        known = cache.get(METRICS_PREFIXES_KEY, set())
+        if not prefixes <= known:
+            cache.set(METRICS_PREFIXES_KEY, known | prefixes, None)
+        _metrics_prefixes.update(prefixes)
+    for (prefix, event), delta in pending.items():
+        _incr(METRICS_KEY.format(prefix, event), delta)
+
+
+def cache_metrics():
+    """{prefix: {event: count}} over every process."""
+    flush_metrics()
+    prefixes = sorted(cache.get(METRICS_PREFIXES_KEY, set()))
+    keys = {
+        METRICS_KEY.format(prefix, event): (prefix, event)
+        for prefix in prefixes for event in METRIC_EVENTS
+    }
+    values = cache.get_many(list(keys))
+    metrics = {prefix: dict.fromkeys(METRIC_EVENTS, 0) for prefix in prefixes}
+    for key, value in values.items():
+        prefix, event = keys[key]
+        metrics[prefix][event] = value
+    return metrics
+
+
+def reset_metrics():
+    """Zeroes the counters of every process."""
+    with _metrics_lock:
+        _metrics.clear()
+    cache.delete_many([
+        METRICS_KEY.format(prefix, event)
+        for prefix in cache.get(METRICS_PREFIXES_KEY, set())
+        for event in METRIC_EVENTS
+    ])
+    cache.delete(METRICS_PREFIXES_KEY)
+    _metrics_prefixes.clear()
+
+
+def _wait_for(key, lock):
+    """Entry another worker is computing, None when it gives up."""
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None or not cache.has_key(lock):
+            return entry
+    return None
+
+
+def read_through(key, compute, timeout, prefix=None):
+    """Cached result of compute(), recomputed by one worker at a time.
+
+    Entries remember how long compute() took, and every read recomputes
+    early with a probability growing as the expiry nears, so a busy key
+    is refreshed before it expires. The worker holding the lock
+    recomputes while the others serve the expired value or wait for it.
+    """
+    prefix = prefix or key.split(':', 1)[0]
+    now = time.time()
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        early = -delta * settings.CACHE_EARLY_EXPIRY_BETA * math.log(
+            1 - random.random())
+        if now + early < expires:
+            count(prefix, 'hit')
+            return value
+    lock = LOCK_KEY.format(key)
+    locked = cache.add(lock, True, settings.CACHE_LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            count(prefix, 'hit' if now < entry[2] else 'stale')
+            return entry[0]
+        entry = _wait_for(key, lock)
+        if entry is not None:
+            count(prefix, 'wait')
+            return entry[0]
+    if entry is None or now >= entry[2]:
+        count(prefix, 'miss')
+    else:
+        count(prefix, 'early')
+    try:
+        started = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - started
+        if timeout is None:
+            cache.set(key, (value, delta, math.inf), None)
+        else:
+            cache.set(key, (value, delta, time.time() + timeout),
+                      timeout + settings.CACHE_STALE_TIMEOUT)
+    finally:
+        if locked:
+            cache.delete(lock)
+    return value
+
+
+def feed_generation(scope):
+    """Current generation of a feed, part of its fragment cache key."""
+    key = GENERATION_KEY.format(scope)
+    generation = cache.get(key)
+    if generation is None:
+        # a clock value never repeats a generation lost to eviction
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_feed_generations(*scopes):
+    """Invalidates every cached page of the feeds."""
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+
+def feed_scopes(post):
+    """Feeds that show the post."""
+    scopes = ['index', f'profile:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
+
+
+def feed_cache_context(scope, page):
+    """Template variables of the {% cache %} tag around a feed.
+
+    The generation moves when posts enter or leave the feed, the
+    newest updated_at of the page when one of its posts or counters
+    changes.
+    """
+    changed = max((post.version for post in page), default=0)
+    return {
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'feed_version': f'{feed_generation(scope)}.{changed}',
+    }
+
+
+def is_following(user, author):
+    """Whether the viewer follows the author, cached per viewer.
+
+    One indexed lookup of the unique (user, author) pair, never the
+    follower list of the author.
+    """
+    if not user.is_authenticated:
+        return False
+    return read_through(
+        FOLLOW_KEY.format(user.pk, author.pk),
+        Follow.objects.filter(user=user, author=author).exists,
+        settings.FOLLOW_CACHE_TIMEOUT)
+
+
+def forget_follow_state(user_id, *author_ids):
+    """Drops the cached answers of is_following()."""
+    cache.delete_many([
+        FOLLOW_KEY.format(user_id, author_id) for author_id in author_ids
+    ])
@@ -0,0 +1,83 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .cache import feed_generation
+from .models import Group, Post, User
+
+
+def conditional_page(version):
+    """Lets browsers and proxies revalidate anonymous pages for free.
+
+    ``version(request, *args, **kwargs)`` returns a cheap value that
+    changes whenever the page would, or None when it cannot tell. The
+    ETag of anonymous GETs is built from it before the view runs, so an
+    unchanged page is a 304 without rendering. Pages of logged in users
+    hold their name and forms and stay private.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+                return response
+            value = version(request, *args, **kwargs)
+            if value is None:
+                return view(request, *args, **kwargs)
+            etag = quote_etag(hashlib.sha1(
+                repr((request.get_full_path(), value)).encode()
+            ).hexdigest())
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                patch_cache_control(
+                    response, public=True,
+                    max_age=settings.PAGE_CACHE_MAX_AGE)
+            return response
+        return wrapper
+    return decorator
+
+
+def last_change():
+    """Newest updated_at of all posts, one step down its index.
+
+    Any change anywhere moves it: conservative for a single feed, but
+    its cost does not grow with the feed.
+    """
+    return Post.objects.aggregate(changed=Max('updated_at'))['changed']
+
+
+def index_version(request):
+    """Version of the index page: its posts and their counters."""
+    return feed_generation('index'), last_change()
+
+
+def group_version(request, slug):
+    """Version of a group page: its feed and its description."""
+    group = Group.objects.filter(slug=slug).values_list(
+        'pk', 'title', 'description').first()
+    return group and (
+        feed_generation(f'group:{group[0]}'), last_change(), group)
+
+
+def profile_version(request, username):
+    """Version of a profile page: its feed, name and counters."""
+    author = User.objects.filter(username=username).values_list(
+        'pk', 'first_name', 'last_name', 'profile__post_count',
+        'profile__follower_count', 'profile__following_count').first()
+    return author and (
+        feed_generation(f'profile:{author[0]}'), last_change(), author)
+
+
+def post_version(request, post_id):
+    """Version of a post page: its changes and the author's counter."""
+    return Post.objects.filter(pk=post_id).values_list(
+        'updated_at', 'author__profile__post_count').first()
@@ -0,0 +1,123 @@
+import csv
+import json
+import zlib
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post
+
+FORMATS = ('csv', 'jsonl')
+
+# name: (model, (column, lookup) pairs, timestamp field or None)
+TABLES = {
+    'posts': (Post, (
+        ('id', 'pk'),
+        ('author', 'author__username'),
+        ('group', 'group__slug'),
+        ('text', 'text'),
+        ('pub_date', 'pub_date'),
+        ('updated_at', 'updated_at'),
+        ('comment_count', 'comment_count'),
+        ('image', 'image'),
+    ), 'updated_at'),
+    'comments': (Comment, (
+        ('id', 'pk'),
+        ('post', 'post_id'),
+        ('author', 'author__username'),
+        ('text', 'text'),
+        ('created', 'created'),
+    ), 'created'),
+    'follows': (Follow, (
+        ('id', 'pk'),
+        ('user', 'user__username'),
+        ('author', 'author__username'),
+    ), None),
+    'groups': (Group, (
+        ('id', 'pk'),
+        ('slug', 'slug'),
+        ('title', 'title'),
+        ('description', 'description'),
+    ), None),
+}
+
+
+def parse_timestamp(value):
+    """Aware datetime of an ISO 8601 string, ValueError if it is not."""
+    since = parse_datetime(value)
+    if since is None:
+        raise ValueError(f'Not an ISO 8601 date: {value!r}')
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def batches(name, since=None, batch_size=2000):
+    """Rows of a table as tuples, one list per keyset batch of ids.
+
+    Only a batch is held in memory however large the table is.
+    """
+    model, columns, timestamp = TABLES[name]
+    queryset = model.objects.order_by('pk')
+    if since is not None:
+        queryset = queryset.filter(**{f'{timestamp}__gt': since})
+    lookups = [lookup for _, lookup in columns]
+    last_pk = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last_pk).values_list(*lookups)
+            [:batch_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield [
+            tuple(value.isoformat() if isinstance(value, datetime)
+                  else value for value in row)
+            for row in rows
+        ]
+
+
+class Echo:
+    """File-like object csv.writer writes a line to and gets back."""
+
+    def write(self, value):
+        return value
+
+
+def export_chunks(name, fmt='csv', since=None, batch_size=2000):
+    """Text of an export, one chunk per batch, the CSV header first.
+
+    Raises ValueError before the first chunk for a table without a
+    timestamp to export ``since``.
+    """
+    _, columns, timestamp = TABLES[name]
+    if since is not None and timestamp is None:
+        raise ValueError(f'The {name} have no timestamp to export since.')
+    header = [column for column, _ in columns]
+    return _chunks(name, fmt, since, batch_size, header)
+
+
+def _chunks(name, fmt, since, batch_size, header):
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(header)
+        for rows in batches(name, since, batch_size):
+            yield ''.join(writer.writerow(row) for row in rows)
+    else:
+        for rows in batches(name, since, batch_size):
+            yield ''.join(
+                json.dumps(dict(zip(header, row)), ensure_ascii=False,
+                           cls=DjangoJSONEncoder) + '\n'
+                for row in rows)
+
+
+def gzip_chunks(chunks):
+    """Compresses text chunks into a gzip stream as they come."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
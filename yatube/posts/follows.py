@@ -0,0 +1,59 @@
+from django.db import transaction
+
+from users.models import Profile
+
+from .cache import forget_follow_state
+from .models import Follow
+from .timeline import backfill, prune
+
+
+def lock_follows(user):
+    """Serializes the subscription changes of a user until commit."""
+    Profile.objects.for_user(user)
+    list(Profile.objects.select_for_update().filter(user=user).values('pk'))
+
+
+def follow(user, authors):
+    """Subscribes the user to the authors with one INSERT.
+
+    Existing subscriptions and the user themselves are skipped, so
+    repeating a call changes nothing. Returns the newly followed ids.
+    """
+    author_ids = {author.pk for author in authors} - {user.pk}
+    with transaction.atomic():
+        lock_follows(user)
+        existing = set(Follow.objects.filter(
+            user=user, author_id__in=author_ids
+        ).values_list('author_id', flat=True))
+        new_ids = sorted(author_ids - existing)
+        if not new_ids:
+            return new_ids
+        # a subscription written by a concurrent request is not an error
+        Follow.objects.bulk_create(
+            [Follow(user=user, author_id=author_id) for author_id in new_ids],
+            ignore_conflicts=True)
+        Profile.objects.bump_many(new_ids, 'follower_count')
+        Profile.objects.bump(user.pk, 'following_count', len(new_ids))
+        backfill(user, *new_ids)
+    # bulk_create sends no post_save
+    forget_follow_state(user.pk, *new_ids)
+    return new_ids
+
+
+def unfollow(user, authors):
+    """Drops the subscriptions of the user to the authors at once.
+
+    Returns the ids of the authors that were followed.
+    """
+    author_ids = {author.pk for author in authors}
+    with transaction.atomic():
+        lock_follows(user)
+        follows = Follow.objects.filter(user=user, author_id__in=author_ids)
+        gone_ids = sorted(follows.values_list('author_id', flat=True))
+        if not gone_ids:
+            return gone_ids
+        follows.delete()
+        Profile.objects.bump_many(gone_ids, 'follower_count', -1)
+        Profile.objects.bump(user.pk, 'following_count', -len(gone_ids))
+        prune(user, *gone_ids)
+    return gone_ids
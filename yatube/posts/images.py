@@ -0,0 +1,86 @@
+import json
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Pillow format, mime type and save options, preferred formats first
+FORMATS = (
+    ('AVIF', 'image/avif', {'quality': 60}),
+    ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    ('JPEG', 'image/jpeg', {'quality': 85, 'optimize': True,
+                            'progressive': True}),
+)
+EXTENSIONS = {'AVIF': 'avif', 'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def available_formats():
+    """Formats this Pillow build can encode."""
+    Image.init()
+    return [fmt for fmt in FORMATS if fmt[0] in Image.SAVE]
+
+
+def feed_size(width=None):
+    """Size of a variant with the aspect ratio of the feed geometry."""
+    geometry_width, geometry_height = map(
+        int, settings.POST_THUMBNAIL_GEOMETRY.split('x'))
+    if width is None:
+        return geometry_width, geometry_height
+    return width, round(width * geometry_height / geometry_width)
+
+
+def render_variants(post):
+    """Renders every width and format of the post image in one decode.
+
+    Returns the stored variants, widest first within each format.
+    """
+    with post.image.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    widths = sorted(
+        {*settings.POST_IMAGE_WIDTHS, feed_size()[0]}, reverse=True)
+    cropped = ImageOps.fit(
+        image, feed_size(widths[0]), Image.LANCZOS, centering=(0.5, 0.5))
+    variants = []
+    for width in widths:
+        size = feed_size(width)
+        if cropped.size != size:
+            cropped = cropped.resize(size, Image.LANCZOS)
+        for fmt, mime, options in available_formats():
+            name = (f'posts/variants/{post.pk}/'
+                    f'{width}.{EXTENSIONS[fmt]}')
+            buffer = BytesIO()
+            cropped.save(buffer, fmt, **options)
+            default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants.append({
+                'name': name,
+                'type': mime,
+                'width': size[0],
+                'height': size[1],
+            })
+    return variants
+
+
+def picture_sources(image_variants, version=None):
+    """<source> attributes per format from the stored variants JSON.
+
+    The version is appended to the URLs, a re-rendered image gets new
+    ones and long-lived browser caches never show the old variants.
+    """
+    try:
+        variants = json.loads(image_variants or '[]')
+    except ValueError:
+        return []
+    query = f'?v={version}' if version else ''
+    sources = {}
+    for variant in variants:
+        sources.setdefault(variant['type'], []).append(
+            f"{default_storage.url(variant['name'])}{query} "
+            f"{variant['width']}w")
+    return [
+        {'type': mime, 'srcset': ', '.join(candidates)}
+        for mime, candidates in sources.items()
+    ]
@@ -0,0 +1,125 @@
+import json
+import statistics
+import time
+import tracemalloc
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, setup_databases,
+                               setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Measures latency, query count and memory of the feed pages '
+            'at several data sizes on a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,10000,100000',
+            help='Comma separated numbers of posts to measure at.')
+        parser.add_argument(
+            '--requests', type=int, default=20,
+            help='Requests per page and size.')
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Keep the cache between requests.')
+        parser.add_argument(
+            '--label', default='',
+            help='Stored with every result, e.g. the commit id.')
+        parser.add_argument(
+            '--output',
+            help='JSON lines file the results are appended to.')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = list(self.run(sizes, options))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+        if options['output']:
+            with open(options['output'], 'a') as output:
+                for result in results:
+                    output.write(json.dumps(result) + '\n')
+
+    def run(self, sizes, options):
+        posts = 0
+        for size in sizes:
+            call_command(
+                'generate_data',
+                users=max((size - posts) // 100, 10),
+                posts=size - posts,
+                comments=size - posts,
+                stdout=StringIO(),
+            )
+            posts = size
+            for view, client, url in self.pages():
+                result = {
+                    'label': options['label'],
+                    'size': size,
+                    'view': view,
+                    **self.measure(client, url, options),
+                }
+                self.stdout.write(
+                    '{size:>9} {view:<14} p50 {p50_ms:8.2f} ms  '
+                    'p95 {p95_ms:8.2f} ms  {queries:>3} queries  '
+                    '{peak_kb:8.1f} KiB'.format(**result))
+                yield result
+
+    def pages(self):
+        """(view, client, url) of the busiest page of every feed."""
+        guest = Client()
+        group = Group.objects.annotate(
+            posts=Count('community')).order_by('-posts').first()
+        author = User.objects.annotate(
+            posts=Count('author_posts')).order_by('-posts').first()
+        post = Post.objects.annotate(
+            comment_total=Count('comments')).order_by(
+                '-comment_total').first()
+        reader = User.objects.annotate(
+            follows=Count('follower')).order_by('-follows').first()
+        member = Client()
+        member.force_login(reader)
+        yield 'index', guest, reverse('posts:index')
+        yield 'group_posts', guest, reverse(
+            'posts:group_list', kwargs={'slug': group.slug})
+        yield 'profile', guest, reverse(
+            'posts:profile', kwargs={'username': author.username})
+        yield 'post_detail', guest, reverse(
+            'posts:post_detail', kwargs={'post_id': post.pk})
+        yield 'follow_index', member, reverse('posts:follow_index')
+
+    def measure(self, client, url, options):
+        timings = []
+        for _ in range(options['requests']):
+            if not options['warm']:
+                cache.clear()
+            started = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        if not options['warm']:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+            client.get(url)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        timings.sort()
+        return {
+            'p50_ms': statistics.median(timings),
+            'p95_ms': timings[int(len(timings) * 0.95) - 1],
+            'mean_ms': statistics.mean(timings),
+            'queries': len(queries),
+            'peak_kb': peak / 1024,
+        }
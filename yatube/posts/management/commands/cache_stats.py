@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts.cache import METRIC_EVENTS, cache_metrics, reset_metrics
+
+
+class Command(BaseCommand):
+    help = 'Prints the read-through cache hits and misses per key prefix.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Zero the counters after printing them.')
+
+    def handle(self, *args, **options):
+        metrics = cache_metrics()
+        self.stdout.write(
+            f'{"prefix":<24}'
+            + ''.join(f'{event:>10}' for event in METRIC_EVENTS)
+            + f'{"served":>10}')
+        for prefix, events in metrics.items():
+            total = sum(events.values())
+            # answered without computing in this request
+            served = (
+                events['hit'] + events['stale'] + events['wait']
+            ) / total if total else 0
+            self.stdout.write(
+                f'{prefix:<24}'
+                + ''.join(f'{events[event]:>10}' for event in METRIC_EVENTS)
+                + f'{served:>10.1%}')
+        if options['reset']:
+            reset_metrics()
+            self.stdout.write('Counters reset.')
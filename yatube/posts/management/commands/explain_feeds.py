@@ -0,0 +1,106 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts.models import Comment, Group, Post, User
+from posts.paginators import CursorPaginator
+from posts.timeline import timeline_posts
+
+
+class Command(BaseCommand):
+    help = ('Prints the query plans of the feed queries and fails when '
+            'one of them does not use its index.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=0,
+            help='Synthetic posts inserted before the plans are checked.')
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Posts inserted per bulk INSERT.')
+
+    def handle(self, *args, **options):
+        if options['posts']:
+            self.seed(options['posts'], options['batch_size'])
+        post = Post.objects.order_by('-pub_date', '-pk').last()
+        if post is None:
+            raise CommandError('There are no posts, use --posts.')
+        comment = Comment.objects.first()
+        failures = []
+        for name, queryset, index in self.queries(post, comment):
+            started = time.perf_counter()
+            list(queryset)
+            elapsed = (time.perf_counter() - started) * 1000
+            plan = queryset.explain()
+            if index is None:
+                self.stdout.write(f'{name}: {elapsed:.1f} ms')
+                used = True
+            else:
+                used = index in plan and 'TEMP B-TREE' not in plan
+                self.stdout.write(
+                    f'{name}: {elapsed:.1f} ms, '
+                    f'{"uses" if used else "DOES NOT USE"} {index}')
+            self.stdout.write(f'  {plan}'.replace('\n', '\n  '))
+            if not used:
+                failures.append(name)
+        if failures:
+            raise CommandError(
+                f'Feeds without their index: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('Every feed uses its index.'))
+
+    def queries(self, post, comment):
+        """(name, queryset, expected index or None) of every feed query."""
+        def page(queryset, after=None):
+            paginator = CursorPaginator(
+                queryset, settings.PAGINATOR_COUNT)
+            values = after and paginator.decode_token(
+                paginator.encode_token(after))
+            return paginator.page_queryset(after=values)
+
+        follower = User.objects.filter(follower__isnull=False).first()
+        yield 'index', page(Post.objects.feed()), 'post_pub_date'
+        yield ('index, last page', page(Post.objects.feed(), after=post),
+               'post_pub_date')
+        yield ('profile', page(post.author.author_posts.feed(), after=post),
+               'post_author_pub_date')
+        if post.group_id:
+            yield ('group', page(post.group.community.feed(), after=post),
+                   'post_group_pub_date')
+        discussed = CursorPaginator(
+            Post.objects.feed(), settings.PAGINATOR_COUNT,
+            ordering=('-comment_count', '-pk'))
+        yield 'discussed', discussed.page_queryset(), 'post_comment_count'
+        changes = CursorPaginator(
+            Post.objects.feed().filter(updated_at__gt=post.updated_at),
+            settings.PAGINATOR_COUNT, ordering=('updated_at', 'pk'))
+        yield 'changes', changes.page_queryset(), 'post_updated_at'
+        if follower is not None:
+            # either walking post_pub_date or sorting the delivered
+            # posts is right, depending on how sparse the timeline is
+            yield 'follow', page(timeline_posts(follower)), None
+        if comment is not None:
+            yield ('comments',
+                   comment.post.comments.order_by('created', 'pk')[:10],
+                   'comment_post_created')
+
+    @transaction.atomic
+    def seed(self, count, batch_size):
+        """Adds posts of one author spread over groups, then ANALYZE."""
+        author, _ = User.objects.get_or_create(username='explain_feeds')
+        groups = [
+            Group.objects.get_or_create(
+                slug=f'explain-{i}',
+                defaults={'title': f'Group {i}', 'description': ''})[0]
+            for i in range(10)
+        ]
+        for start in range(0, count, batch_size):
+            Post.objects.bulk_create(
+                Post(author=author, group=groups[i % len(groups)],
+                     text=f'Synthetic post {i}')
+                for i in range(start, min(start + batch_size, count))
+            )
+            self.stdout.write(f'{min(start + batch_size, count)} posts')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
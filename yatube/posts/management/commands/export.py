@@ -0,0 +1,54 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exports import (FORMATS, TABLES, export_chunks, gzip_chunks,
+                           parse_timestamp)
+
+
+class Command(BaseCommand):
+    help = ('Streams a table as CSV or JSON lines in constant memory, '
+            'optionally only the rows changed since a date.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(TABLES))
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument(
+            '--since',
+            help='ISO 8601 date, only rows created or changed after it.')
+        parser.add_argument(
+            '--output',
+            help='File written instead of the standard output.')
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Compress the output with gzip.')
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.EXPORT_BATCH_SIZE,
+            help='Rows read per query.')
+
+    def handle(self, *args, **options):
+        try:
+            since = options['since'] and parse_timestamp(options['since'])
+            chunks = export_chunks(
+                options['table'], options['format'], since or None,
+                options['batch_size'])
+        except ValueError as error:
+            raise CommandError(error)
+        if options['output']:
+            # csv writes its own line endings
+            output = (open(options['output'], 'wb') if options['gzip']
+                      else open(options['output'], 'w', newline=''))
+            with output:
+                self.write(output, chunks, options['gzip'])
+        elif options['gzip']:
+            self.write(sys.stdout.buffer, chunks, True)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+
+    def write(self, output, chunks, compress):
+        if compress:
+            chunks = gzip_chunks(chunks)
+        for chunk in chunks:
+            output.write(chunk)
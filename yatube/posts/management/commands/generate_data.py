@@ -0,0 +1,178 @@
+import random
+from bisect import bisect
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts.bulk import explicit_dates
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+WORDS = (
+    'война мир семья любовь жизнь смерть народ история время душа '
+    'бог правда власть земля свобода человек общество сила разум '
+    'сердце счастье дом дорога город деревня осень весна зима лето'
+).split()
+
+
+class PowerLaw:
+    """Picks ids with probability proportional to 1 / rank ** exponent."""
+
+    def __init__(self, ids, exponent, rng):
+        self.ids = ids
+        self.rng = rng
+        self.cumulative = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(ids) + 1)))
+
+    def pick(self):
+        point = self.rng.random() * self.cumulative[-1]
+        return self.ids[bisect(self.cumulative, point)]
+
+
+class Command(BaseCommand):
+    help = ('Bulk inserts realistic users, groups, posts, comments and '
+            'follows with power-law popularity of authors.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Average subscriptions per user.')
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Power-law exponent of author popularity.')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Posts are spread over this many past days.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days']).total_seconds()
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            groups = self.create_groups(options['groups'])
+            popularity = PowerLaw(users, options['exponent'], self.rng)
+            # how much a user writes does not follow how popular they are
+            activity = PowerLaw(
+                self.rng.sample(users, len(users)), options['exponent'],
+                self.rng)
+            followers = self.create_follows(
+                users, popularity, options['follows'])
+            posts = self.create_posts(
+                options['posts'], activity, groups, followers)
+            self.create_comments(options['comments'], users, posts)
+        # bulk inserts skip the signals that maintain these
+        call_command('rebuild_counters', stdout=self.stdout)
+        call_command('rebuild_comment_counts', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+
+    def report(self, model, count):
+        self.stdout.write(f'{count} {model.__name__} rows')
+
+    def bulk(self, model, rows):
+        """Inserts an iterable of instances in batches."""
+        batch = []
+        count = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+        count += len(batch)
+        self.report(model, count)
+
+    def random_date(self):
+        return self.now - timedelta(seconds=self.rng.random() * self.span)
+
+    def text(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=words)).capitalize()
+
+    def create_users(self, count):
+        password = make_password(None)
+        start = User.objects.count()
+        self.bulk(User, (
+            User(username=f'user{start + i}', first_name='Lev',
+                 last_name=f'Tolstoy {start + i}', password=password)
+            for i in range(count)
+        ))
+        return list(User.objects.order_by('-pk').values_list(
+            'pk', flat=True)[:count])
+
+    def create_groups(self, count):
+        start = Group.objects.count()
+        self.bulk(Group, (
+            Group(title=f'Group {start + i}', slug=f'group-{start + i}',
+                  description=self.text(20))
+            for i in range(count)
+        ))
+        return [None] + list(Group.objects.order_by('-pk').values_list(
+            'pk', flat=True)[:count])
+
+    def create_follows(self, users, popularity, per_user):
+        """Subscriptions to power-law popular authors."""
+        followers = {}
+        follows = []
+        for user_id in users:
+            authors = {popularity.pick() for _ in range(per_user)}
+            authors.discard(user_id)
+            for author_id in authors:
+                follows.append(Follow(user_id=user_id, author_id=author_id))
+                followers.setdefault(author_id, []).append(user_id)
+        self.bulk(Follow, follows)
+        return followers
+
+    def create_posts(self, count, activity, groups, followers):
+        """Posts of active authors, fanned out like new posts are."""
+        dates = sorted(self.random_date() for _ in range(count))
+        with explicit_dates(Post._meta.get_field('pub_date'),
+                            Post._meta.get_field('updated_at')):
+            self.bulk(Post, (
+                Post(author_id=activity.pick(),
+                     group_id=self.rng.choice(groups),
+                     text=self.text(self.rng.randint(5, 80)),
+                     pub_date=pub_date, updated_at=pub_date)
+                for pub_date in dates
+            ))
+        posts = list(Post.objects.order_by('-pk').values_list(
+            'pk', 'author_id', 'pub_date')[:count])
+        limit = settings.TIMELINE_FANOUT_LIMIT
+        self.bulk(TimelineEntry, (
+            TimelineEntry(user_id=user_id, post_id=post_id)
+            for post_id, author_id, _ in posts
+            if len(followers.get(author_id, ())) <= limit
+            for user_id in followers.get(author_id, ())
+        ))
+        return posts
+
+    def create_comments(self, count, users, posts):
+        """Comments after their post, most of them on recent posts."""
+        if not posts:
+            return
+        recent = PowerLaw(posts, 0.8, self.rng)
+
+        def comments():
+            for _ in range(count):
+                post_id, _, pub_date = recent.pick()
+                yield Comment(
+                    post_id=post_id,
+                    author_id=self.rng.choice(users),
+                    text=self.text(self.rng.randint(3, 30)),
+                    created=(pub_date
+                             + (self.now - pub_date) * self.rng.random()))
+
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.bulk(Comment, comments())
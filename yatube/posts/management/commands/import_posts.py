@@ -0,0 +1,245 @@
+import csv
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from posts.bulk import bulk_insert, explicit_dates
+from posts.cache import bump_feed_generations, feed_scopes
+from posts.exports import FORMATS, parse_timestamp
+from posts.models import (Comment, Group, ImportCheckpoint, ImportedPost,
+                          Post, User)
+from posts.search import get_index
+from posts.thumbnails import schedule_thumbnail
+from posts.timeline import fan_out_many
+from users.models import Profile
+
+
+class Lookup:
+    """Map of names to ids, filled from the database batch by batch."""
+
+    def __init__(self, queryset, field, value='pk'):
+        self.queryset = queryset
+        self.field = field
+        self.value = value
+        self.ids = {}
+
+    def load(self, names):
+        missing = {name for name in names if name and name not in self.ids}
+        if missing:
+            found = dict(self.queryset.filter(
+                **{f'{self.field}__in': missing}).values_list(
+                    self.field, self.value))
+            for name in missing:
+                self.ids[name] = found.get(name)
+
+    def get(self, name):
+        return self.ids.get(name)
+
+
+def read_records(path, fmt):
+    """Dicts of the rows of a CSV or JSON lines file, one at a time."""
+    with open(path, newline='', encoding='utf-8') as source:
+        if fmt == 'csv':
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = ('Imports posts or comments from CSV or JSON lines with bulk '
+            'inserts; a failed run resumes after its last batch. Counters, '
+            'the search index and timelines follow every batch, and the '
+            'thumbnails of imported images are queued for run_tasks.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--table', choices=('posts', 'comments'), default='posts')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Taken from the file extension by default.')
+        parser.add_argument(
+            '--source', default='import',
+            help='Platform the ids in the file belong to.')
+        parser.add_argument(
+            '--images', default='.',
+            help='Directory the image paths of the posts are relative to.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Records inserted per transaction.')
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Threads copying images.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        self.source = options['source']
+        self.images = options['images']
+        self.now = timezone.now()
+        self.index = get_index()
+        self.authors = Lookup(User.objects, 'username')
+        self.groups = Lookup(Group.objects, 'slug')
+        self.posts = Lookup(
+            ImportedPost.objects.filter(source=self.source), 'source_id',
+            'post_id')
+        self.scopes = set()
+        self.imported = self.skipped = 0
+        # the checkpoint moves in the transaction of every batch
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            name=f'{self.source}:{options["table"]}:'
+                 f'{os.path.basename(path)}')
+        if checkpoint.position:
+            self.stdout.write(
+                f'Resuming after {checkpoint.position} records.')
+        records = islice(read_records(path, fmt), checkpoint.position, None)
+        import_batch = getattr(self, f'import_{options["table"]}')
+        started = time.perf_counter()
+        done = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    import_batch(batch, checkpoint.position, pool)
+                    checkpoint.position += len(batch)
+                    checkpoint.save()
+                done += len(batch)
+                rate = done / (time.perf_counter() - started)
+                self.stdout.write(
+                    f'{checkpoint.position} records, {self.imported} '
+                    f'imported, {self.skipped} skipped, {rate:.0f} '
+                    f'records/s')
+        bump_feed_generations(*self.scopes)
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {self.imported} imported, {self.skipped} skipped.'))
+
+    def date(self, value):
+        """Aware datetime of a record field, now when it is empty."""
+        return parse_timestamp(value) if value else self.now
+
+    def copy_image(self, image):
+        """Stores an image under MEDIA_ROOT/posts/, '' if it is missing."""
+        if not image:
+            return ''
+        try:
+            with open(os.path.join(self.images, image), 'rb') as source:
+                return default_storage.save(
+                    f'posts/{os.path.basename(image)}', File(source))
+        except OSError as error:
+            self.stderr.write(f'Image {image} not copied: {error}')
+            return ''
+
+    def import_posts(self, batch, position, pool):
+        self.authors.load(record.get('author') for record in batch)
+        self.groups.load(record.get('group') for record in batch)
+        # records without an id are known by their line number
+        source_ids = [
+            str(number if record.get('id') in (None, '') else record['id'])
+            for number, record in enumerate(batch, position + 1)
+        ]
+        self.posts.load(source_ids)
+        posts = []
+        imported_ids = []
+        images = []
+        # repeated ids of this batch are not in the lookup yet
+        seen = set()
+        for source_id, record in zip(source_ids, batch):
+            author_id = self.authors.get(record.get('author'))
+            group_id = self.groups.get(record.get('group'))
+            try:
+                pub_date = self.date(record.get('pub_date'))
+            except ValueError:
+                pub_date = None
+            if (author_id is None or pub_date is None
+                    or not record.get('text')
+                    or (record.get('group') and group_id is None)
+                    or self.posts.get(source_id) or source_id in seen):
+                self.skipped += 1
+                continue
+            seen.add(source_id)
+            posts.append(Post(
+                author_id=author_id, group_id=group_id,
+                text=record['text'], pub_date=pub_date, updated_at=pub_date))
+            imported_ids.append(source_id)
+            images.append(record.get('image'))
+        for post, image in zip(posts, pool.map(self.copy_image, images)):
+            post.image = image
+        with explicit_dates(Post._meta.get_field('pub_date'),
+                            Post._meta.get_field('updated_at')):
+            bulk_insert(Post, posts, ('author_id', 'pub_date', 'text'))
+        ImportedPost.objects.bulk_create(
+            ImportedPost(source=self.source, source_id=source_id, post=post)
+            for source_id, post in zip(imported_ids, posts))
+        self.posts.ids.update(
+            (source_id, post.pk)
+            for source_id, post in zip(imported_ids, posts))
+        # bulk inserts skip the signals that maintain these
+        fan_out_many(posts)
+        self.index.add_many(posts)
+        by_count = {}
+        for author_id, count in Counter(
+                post.author_id for post in posts).items():
+            by_count.setdefault(count, []).append(author_id)
+        for count, author_ids in by_count.items():
+            Profile.objects.bump_many(author_ids, 'post_count', count)
+        for post in posts:
+            self.scopes.update(feed_scopes(post))
+            if post.image:
+                schedule_thumbnail(post)
+        self.imported += len(posts)
+
+    def import_comments(self, batch, position, pool):
+        self.authors.load(record.get('author') for record in batch)
+        self.posts.load(str(record.get('post')) for record in batch)
+        comments = []
+        for record in batch:
+            post_id = self.posts.get(str(record.get('post')))
+            author_id = self.authors.get(record.get('author'))
+            try:
+                created = self.date(record.get('created'))
+            except ValueError:
+                created = None
+            if (post_id is None or author_id is None or created is None
+                    or not record.get('text')):
+                self.skipped += 1
+                continue
+            comments.append(Comment(
+                post_id=post_id, author_id=author_id, text=record['text'],
+                created=created))
+        with explicit_dates(Comment._meta.get_field('created')):
+            bulk_insert(Comment, comments,
+                        ('post_id', 'author_id', 'created', 'text'))
+        # bulk inserts skip the signals that maintain these
+        self.index.add_many(comments)
+        activity = {}
+        for comment in comments:
+            count, last = activity.get(comment.post_id, (0, comment.created))
+            activity[comment.post_id] = (
+                count + 1, max(last, comment.created))
+        now = timezone.now()
+        for post_id, (count, last) in activity.items():
+            Post.objects.filter(pk=post_id).update(
+                comment_count=F('comment_count') + count,
+                last_commented_at=Case(
+                    When(Q(last_commented_at__gte=last),
+                         then=F('last_commented_at')),
+                    default=Value(last),
+                ),
+                updated_at=now,
+            )
+        self.imported += len(comments)
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the comment count and last comment date of posts.'
+    fields = ['comment_count', 'last_commented_at']
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Posts processed per transaction.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        total = 0
+        fixed = 0
+        while True:
+            with transaction.atomic():
+                posts = list(
+                    Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                    .annotate(
+                        comment_total=Count('comments'),
+                        last_comment=Max('comments__created'))
+                    .values_list('pk', 'comment_total', 'last_comment')
+                    [:batch_size]
+                )
+                if not posts:
+                    break
+                fixed += self.rebuild(posts)
+            last_pk = posts[-1][0]
+            total += len(posts)
+        self.stdout.write(self.style.SUCCESS(
+            f'Comment counts checked for {total} posts, {fixed} fixed.'))
+
+    def rebuild(self, posts):
+        stored = Post.objects.select_for_update().only(
+            'pk', *self.fields).in_bulk([post[0] for post in posts])
+        changed = []
+        now = timezone.now()
+        for pk, comment_count, last_commented_at in posts:
+            post = stored.get(pk)
+            if post is None:
+                continue
+            if (post.comment_count, post.last_commented_at) != (
+                    comment_count, last_commented_at):
+                post.comment_count = comment_count
+                post.last_commented_at = last_commented_at
+                post.updated_at = now
+                changed.append(post)
+        Post.objects.bulk_update(changed, [*self.fields, 'updated_at'])
+        return len(changed)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.search import get_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the search index of posts and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows written to the index at once.')
+
+    def handle(self, *args, **options):
+        index = get_index()
+        with transaction.atomic():
+            index.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{type(index).__name__} rebuilt.'))
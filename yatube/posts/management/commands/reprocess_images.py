@@ -0,0 +1,53 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import render_thumbnail_in_worker
+
+
+def init_worker():
+    """Sets Django up in processes that were spawned, not forked."""
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = ('Renders the responsive variants and feed thumbnails '
+            'of post images in a process pool.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Reprocess every post with an image, not only new ones.')
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='Worker processes, one per CPU core by default.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Posts read from the database at once.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').order_by('pk')
+        if not options['all']:
+            posts = posts.filter(thumbnail='')
+        last_pk = 0
+        total = 0
+        with ProcessPoolExecutor(max_workers=options['processes'],
+                                 initializer=init_worker) as pool:
+            while True:
+                batch = list(posts.filter(pk__gt=last_pk).values_list(
+                    'pk', flat=True)[:options['batch_size']])
+                if not batch:
+                    break
+                last_pk = batch[-1]
+                # forked workers must not share the parent connection
+                connections.close_all()
+                list(pool.map(render_thumbnail_in_worker, batch,
+                              chunksize=16))
+                total += len(batch)
+                self.stdout.write(f'{total} images processed')
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {total} images processed.'))
@@ -0,0 +1,60 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    """backfill() of every existing follow, followers in chunks."""
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    authors = Follow.objects.order_by('author_id').values_list(
+        'author_id', flat=True).distinct()
+    for author_id in authors:
+        posts = list(
+            Post.objects.filter(author_id=author_id).order_by('-pub_date')
+            .values_list('pk', flat=True)[:settings.TIMELINE_BACKFILL])
+        if not posts:
+            continue
+        followers = Follow.objects.filter(author_id=author_id).order_by(
+            'user_id').values_list('user_id', flat=True)
+        last_user = 0
+        while True:
+            users = list(followers.filter(user_id__gt=last_user)[:1000])
+            if not users:
+                break
+            last_user = users[-1]
+            TimelineEntry.objects.bulk_create(
+                (TimelineEntry(user_id=user_id, post_id=post_id)
+                 for user_id in users for post_id in posts),
+                batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0012_auto_20211220_1437'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post', verbose_name='post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='follower')),
+            ],
+            options={
+                'verbose_name': 'timeline entry',
+                'db_table': 'subscription timeline',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_auto_20261018_1709'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, height_field='thumbnail_height', upload_to='cache/', verbose_name='feed thumbnail', width_field='thumbnail_width'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_height',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='thumbnail height'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_width',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='thumbnail width'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_auto_20261018_1710'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.TextField(blank=True, editable=False, verbose_name='image variants'),
+        ),
+    ]
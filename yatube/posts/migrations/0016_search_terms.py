@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='term')),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Comment', verbose_name='comment')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post', verbose_name='post')),
+            ],
+            options={
+                'verbose_name': 'search term',
+                'db_table': 'search terms',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'post'], name='search_term_post'),
+        ),
+    ]
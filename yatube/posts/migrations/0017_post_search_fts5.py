@@ -0,0 +1,36 @@
+from django.db import migrations
+
+CREATE_TABLE = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS post_search USING fts5('
+    "body, post_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+)
+FILL_TABLE = (
+    'INSERT INTO post_search (rowid, body, post_id) '
+    'SELECT id * 2, text, id FROM "all post"',
+    'INSERT INTO post_search (rowid, body, post_id) '
+    'SELECT id * 2 + 1, text, post_id FROM "users comments"',
+)
+
+
+def create_fts5_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_TABLE)
+    for sql in FILL_TABLE:
+        schema_editor.execute(sql)
+
+
+def drop_fts5_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_search_terms'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts5_table, drop_fts5_table),
+    ]
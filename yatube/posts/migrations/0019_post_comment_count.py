@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:36
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+
+
+def count_comments(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Post = apps.get_model('posts', 'Post')
+    comments = Comment.objects.filter(post=OuterRef('pk')).values('post')
+    Post.objects.filter(comments__isnull=False).update(
+        comment_count=Subquery(
+            comments.annotate(total=Count('pk')).values('total')),
+        last_commented_at=Subquery(
+            comments.annotate(last=Max('created')).values('last')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='comment count'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='last_commented_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='last comment'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-comment_count', '-id'], name='post_comment_count'),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
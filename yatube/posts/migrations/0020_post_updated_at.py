@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:44
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    """The last known change: publication or the latest comment."""
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated_at=F('pub_date'))
+    Post.objects.filter(last_commented_at__gt=F('pub_date')).update(
+        updated_at=F('last_commented_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedPost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.BigIntegerField(verbose_name='post id')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='time of deletion')),
+            ],
+            options={
+                'verbose_name': 'deleted post',
+                'db_table': 'deleted posts',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='last change'),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['updated_at', 'id'], name='post_updated_at'),
+        ),
+        migrations.AddIndex(
+            model_name='deletedpost',
+            index=models.Index(fields=['deleted_at', 'id'], name='deleted_post_deleted_at'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='import name')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='records done')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='last batch')),
+            ],
+            options={
+                'verbose_name': 'import checkpoint',
+                'db_table': 'import checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportedPost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100, verbose_name='source platform')),
+                ('source_id', models.CharField(max_length=100, verbose_name='id on the source')),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='import_source', to='posts.Post', verbose_name='post')),
+            ],
+            options={
+                'verbose_name': 'imported post',
+                'db_table': 'imported posts',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importedpost',
+            constraint=models.UniqueConstraint(fields=('source', 'source_id'), name='unique_imported_post'),
+        ),
+    ]
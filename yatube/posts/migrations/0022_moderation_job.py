@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0021_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('delete_author_posts', 'delete all posts by author'), ('move_to_group', 'move posts to group')], max_length=32, verbose_name='action')),
+                ('post_ids', models.TextField(blank=True, verbose_name='post ids')),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='queued', max_length=16, verbose_name='status')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='posts to process')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='posts processed')),
+                ('last_pk', models.BigIntegerField(default=0, verbose_name='last processed id')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='time of creation')),
+                ('finished_at', models.DateTimeField(null=True, verbose_name='time of finish')),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='moderated_by_jobs', to=settings.AUTH_USER_MODEL, verbose_name='author of the posts')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='moderation_jobs', to=settings.AUTH_USER_MODEL, verbose_name='moderator')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='moderation_jobs', to='posts.Group', verbose_name='target group')),
+            ],
+            options={
+                'verbose_name': 'moderation job',
+                'db_table': 'moderation jobs',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
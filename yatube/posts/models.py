@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils.functional import cached_property
+
+from .images import picture_sources
 
 User = get_user_model()
 
@@ -18,6 +21,14 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    """Querysets for the post feeds."""
+
+    def feed(self):
+        """Posts with everything the feed templates render per row."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     """Model for records, field group is linked by model
     Group and author is linked by User."""
@@ -42,15 +53,59 @@ class Post(models.Model):
         blank=True,
         help_text='Загрузить картинку'
     )
+    thumbnail = models.ImageField(
+        'feed thumbnail',
+        upload_to='cache/',
+        blank=True,
+        editable=False,
+        width_field='thumbnail_width',
+        height_field='thumbnail_height'
+    )
+    thumbnail_width = models.PositiveIntegerField(
+        'thumbnail width', null=True, editable=False)
+    thumbnail_height = models.PositiveIntegerField(
+        'thumbnail height', null=True, editable=False)
+    image_variants = models.TextField(
+        'image variants', blank=True, editable=False)
+    comment_count = models.PositiveIntegerField(
+        'comment count', default=0, editable=False)
+    last_commented_at = models.DateTimeField(
+        'last comment', null=True, blank=True, editable=False)
+    # every change of the post or of its counters moves it
+    updated_at = models.DateTimeField('last change', auto_now=True)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'notes of famous people'
         db_table = 'all post'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date'),
+            models.Index(fields=['-comment_count', '-id'],
+                         name='post_comment_count'),
+            models.Index(fields=['updated_at', 'id'],
+                         name='post_updated_at'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @cached_property
+    def picture_sources(self):
+        """srcset of the responsive variants for every stored format."""
+        return picture_sources(self.image_variants, self.version)
+
+    @property
+    def version(self):
+        """updated_at in microseconds, for cache keys and URLs."""
+        return self.updated_at and round(self.updated_at.timestamp() * 10**6)
+
 
 class Comment(models.Model):
     """Add commets to post."""
@@ -71,6 +126,10 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'comments'
         db_table = 'users comments'
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -101,3 +160,176 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} subscribed to {self.author}'
+
+
+class DeletedPost(models.Model):
+    """Tombstone of a deleted post for incremental sync clients."""
+    post_id = models.BigIntegerField('post id')
+    deleted_at = models.DateTimeField('time of deletion', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'deleted post'
+        db_table = 'deleted posts'
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'],
+                         name='deleted_post_deleted_at'),
+        ]
+
+    def __str__(self):
+        return f'post {self.post_id} deleted'
+
+
+class ImportCheckpoint(models.Model):
+    """Records of an import file committed so far."""
+    name = models.CharField('import name', max_length=255, unique=True)
+    position = models.PositiveIntegerField('records done', default=0)
+    updated_at = models.DateTimeField('last batch', auto_now=True)
+
+    class Meta:
+        verbose_name = 'import checkpoint'
+        db_table = 'import checkpoints'
+
+    def __str__(self):
+        return f'{self.name}: {self.position}'
+
+
+class ImportedPost(models.Model):
+    """Id of an imported post on the platform it came from."""
+    source = models.CharField('source platform', max_length=100)
+    source_id = models.CharField('id on the source', max_length=100)
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='post',
+        related_name='import_source')
+
+    class Meta:
+        verbose_name = 'imported post'
+        db_table = 'imported posts'
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'source_id'],
+                                    name='unique_imported_post'),
+        ]
+
+    def __str__(self):
+        return f'{self.source} {self.source_id}'
+
+
+class ModerationJob(models.Model):
+    """Bulk moderation of posts run in chunks outside the request."""
+    DELETE_AUTHOR_POSTS = 'delete_author_posts'
+    MOVE_TO_GROUP = 'move_to_group'
+    ACTIONS = (
+        (DELETE_AUTHOR_POSTS, 'delete all posts by author'),
+        (MOVE_TO_GROUP, 'move posts to group'),
+    )
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'queued'),
+        (RUNNING, 'running'),
+        (DONE, 'done'),
+        (FAILED, 'failed'),
+    )
+    action = models.CharField('action', max_length=32, choices=ACTIONS)
+    author = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        verbose_name='author of the posts',
+        related_name='moderated_by_jobs',
+        null=True,
+        blank=True)
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        verbose_name='target group',
+        related_name='moderation_jobs',
+        null=True,
+        blank=True)
+    # JSON list of the selected post ids of a move
+    post_ids = models.TextField('post ids', blank=True)
+    status = models.CharField(
+        'status', max_length=16, choices=STATUSES, default=QUEUED)
+    total = models.PositiveIntegerField('posts to process', default=0)
+    processed = models.PositiveIntegerField('posts processed', default=0)
+    # keyset position: the job resumes after the last committed chunk
+    last_pk = models.BigIntegerField('last processed id', default=0)
+    error = models.TextField('error', blank=True)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        verbose_name='moderator',
+        related_name='moderation_jobs',
+        null=True,
+        blank=True)
+    created = models.DateTimeField('time of creation', auto_now_add=True)
+    finished_at = models.DateTimeField('time of finish', null=True)
+
+    class Meta:
+        verbose_name = 'moderation job'
+        db_table = 'moderation jobs'
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.get_action_display()} #{self.pk}'
+
+    @property
+    def progress(self):
+        """Processed share of the posts in percent."""
+        if not self.total:
+            return 100 if self.status == self.DONE else 0
+        return min(100, self.processed * 100 // self.total)
+
+
+class TimelineEntry(models.Model):
+    """Post delivered to the subscription feed of a follower."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='follower',
+        related_name='timeline')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='post',
+        related_name='timeline_entries')
+
+    class Meta:
+        verbose_name = 'timeline entry'
+        db_table = 'subscription timeline'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} in timeline of {self.user_id}'
+
+
+class SearchTerm(models.Model):
+    """Inverted index entry: a word of a post or of a comment to it."""
+    term = models.CharField('term', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='post',
+        related_name='search_terms')
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        verbose_name='comment',
+        related_name='search_terms',
+        blank=True,
+        null=True)
+
+    class Meta:
+        verbose_name = 'search term'
+        db_table = 'search terms'
+        indexes = [
+            models.Index(fields=['term', 'post'], name='search_term_post'),
+        ]
+
+    def __str__(self):
+        return self.term
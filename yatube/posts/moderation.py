@@ -0,0 +1,129 @@
+import json
+import logging
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_with_thumbnails
+
+from tasks.queue import task
+
+from .cache import bump_feed_generations, feed_scopes
+from .models import ModerationJob, Post
+
+logger = logging.getLogger(__name__)
+
+
+def queue_job(**fields):
+    """Creates a job and queues its task in the same transaction."""
+    job = ModerationJob.objects.create(**fields)
+    run_job.delay(job.pk)
+    return job
+
+
+@task(max_attempts=3, timeout=60 * 60)
+def run_job(job_id):
+    """Runs a job in keyset chunks, one transaction each.
+
+    The position is committed with every chunk: a job interrupted by a
+    failure or a lost worker goes on after its last chunk when the task
+    is retried.
+    """
+    claimed = ModerationJob.objects.filter(pk=job_id).exclude(
+        status=ModerationJob.DONE).update(
+            status=ModerationJob.RUNNING, error='')
+    if not claimed:
+        return
+    job = ModerationJob.objects.get(pk=job_id)
+    chunks = CHUNKS[job.action](job)
+    process = PROCESSORS[job.action]
+    try:
+        for chunk in chunks:
+            with transaction.atomic():
+                files = process(job, chunk)
+                job.last_pk = chunk[-1]
+                job.processed += len(chunk)
+                job.save(update_fields=['last_pk', 'processed'])
+            remove_files(files)
+    except Exception as error:
+        job.status = ModerationJob.FAILED
+        job.error = f'{type(error).__name__}: {error}'
+        job.save(update_fields=['status', 'error'])
+        raise
+    job.status = ModerationJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+
+
+def author_chunks(job):
+    """Ids of the author's posts after the last chunk, in pk order."""
+    size = settings.MODERATION_CHUNK_SIZE
+    while True:
+        chunk = list(
+            Post.objects.filter(author_id=job.author_id, pk__gt=job.last_pk)
+            .order_by('pk').values_list('pk', flat=True)[:size])
+        if not chunk:
+            return
+        yield chunk
+
+
+def selected_chunks(job):
+    """The selected post ids after the last chunk, in pk order."""
+    size = settings.MODERATION_CHUNK_SIZE
+    post_ids = sorted(json.loads(job.post_ids or '[]'))
+    while True:
+        start = bisect_right(post_ids, job.last_pk)
+        chunk = post_ids[start:start + size]
+        if not chunk:
+            return
+        yield chunk
+
+
+def delete_posts(job, chunk):
+    """Deletes posts with their comments; returns their files."""
+    posts = Post.objects.filter(pk__in=chunk)
+    files = [
+        (image, [variant['name']
+                 for variant in json.loads(variants or '[]')])
+        for image, variants in posts.values_list('image', 'image_variants')
+    ]
+    posts.delete()
+    return files
+
+
+def move_posts(job, chunk):
+    """Moves posts to the group of the job."""
+    if job.group_id is None:
+        raise ValueError('The target group was deleted.')
+    posts = Post.objects.filter(pk__in=chunk)
+    scopes = {f'group:{job.group_id}'}
+    for post in posts.only('author_id', 'group_id'):
+        scopes.update(feed_scopes(post))
+    posts.update(group_id=job.group_id, updated_at=timezone.now())
+    transaction.on_commit(lambda: bump_feed_generations(*scopes))
+    return []
+
+
+def remove_files(files):
+    """Deletes the images of deleted posts and every thumbnail of them."""
+    for image, variants in files:
+        try:
+            if image:
+                # sorl drops its own thumbnails of the image as well
+                delete_with_thumbnails(image)
+            for name in variants:
+                default_storage.delete(name)
+        except OSError:
+            logger.exception('Files of image %s not deleted', image)
+
+
+CHUNKS = {
+    ModerationJob.DELETE_AUTHOR_POSTS: author_chunks,
+    ModerationJob.MOVE_TO_GROUP: selected_chunks,
+}
+PROCESSORS = {
+    ModerationJob.DELETE_AUTHOR_POSTS: delete_posts,
+    ModerationJob.MOVE_TO_GROUP: move_posts,
+}
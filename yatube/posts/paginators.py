@@ -0,0 +1,155 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+
+class CursorPaginator(Paginator):
+    """Keyset paginator: no COUNT(*) and no OFFSET.
+
+    Rows are ordered by ``ordering`` (fields all ascending or all
+    descending, the last one must be unique) and a page is addressed by an
+    opaque token that encodes the ordering values of its boundary row.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk')):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.fields = [name.lstrip('-') for name in ordering]
+        self.descending = ordering[0].startswith('-')
+
+    def encode_token(self, obj):
+        values = [self._field(name).value_to_string(obj)
+                  for name in self.fields]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_token(self, token):
+        """Returns the ordering values of a token or None if it is broken.
+
+        A value that is null is broken as well: it cannot be compared.
+        """
+        try:
+            raw = urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            values = json.loads(raw.decode())
+            if (not isinstance(values, list)
+                    or len(values) != len(self.fields)):
+                return None
+            values = [
+                self._field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            return None
+        return None if None in values else values
+
+    def _field(self, name):
+        meta = self.object_list.model._meta
+        return meta.pk if name == 'pk' else meta.get_field(name)
+
+    def _keyset(self, values, lookup):
+        """(a, b) < (x, y) written as a < x OR (a = x AND b < y).
+
+        The extra a <= x (a >= x for ``gt``) lets the database seek the
+        index instead of scanning it from the first row.
+        """
+        condition = Q()
+        for i, name in enumerate(self.fields):
+            step = Q(**{f'{name}__{lookup}': values[i]})
+            for prev_name, prev_value in zip(self.fields[:i], values[:i]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return Q(**{f'{self.fields[0]}__{lookup}e': values[0]}) & condition
+
+    def page_queryset(self, after=None, before=None):
+        """Rows of a page plus one lookahead row, for decoded tokens.
+
+        The rows before ``before`` come in reverse order.
+        """
+        forward, backward = ('lt', 'gt') if self.descending else ('gt', 'lt')
+        if before is not None:
+            reverse = [
+                name if self.descending else f'-{name}'
+                for name in self.fields
+            ]
+            return self.object_list.filter(
+                self._keyset(before, backward)
+            ).order_by(*reverse)[:self.per_page + 1]
+        queryset = self.object_list
+        if after is not None:
+            queryset = queryset.filter(self._keyset(after, forward))
+        return queryset[:self.per_page + 1]
+
+    def get_cursor_page(self, after=None, before=None):
+        """Returns the page after or before a token, the first by default."""
+        after = self.decode_token(after) if after else None
+        before = self.decode_token(before) if before else None
+        size = self.per_page
+        rows = list(self.page_queryset(after, before))
+        if before is not None:
+            has_previous = len(rows) > size
+            rows = rows[:size][::-1]
+            has_next = True
+        else:
+            has_next = len(rows) > size
+            rows = rows[:size]
+            has_previous = after is not None
+        page = Page(rows, 1, self)
+        page.next_token = (
+            self.encode_token(rows[-1]) if has_next and rows else None
+        )
+        page.previous_token = (
+            self.encode_token(rows[0]) if has_previous and rows else None
+        )
+        return page
+
+
+def paginate(request, post_list, ordering=('-pub_date', '-pk'),
+             per_page=None):
+    """Builds the cursor page for a feed from ``?after=``/``?before=``."""
+    paginator = CursorPaginator(
+        post_list, per_page or settings.PAGINATOR_COUNT, ordering=ordering
+    )
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+def estimated_count(model):
+    """Rows in the table of a model from statistics, without a scan."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(model._meta.db_table)])
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+    # ids are never reused, the largest one bounds the rows
+    return model._default_manager.aggregate(
+        estimate=Max('pk'))['estimate'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Offset paginator that never counts a large table row by row.
+
+    Up to ADMIN_EXACT_COUNT_LIMIT rows are counted exactly. Beyond it
+    an unfiltered table reports its estimated size and a filtered one
+    stops at the limit.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        queryset = self.object_list
+        count = queryset.order_by()[:limit + 1].count()
+        if count <= limit:
+            return count
+        if not queryset.query.where:
+            return max(estimated_count(queryset.model), count)
+        return limit
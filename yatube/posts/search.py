@@ -0,0 +1,159 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Post, SearchTerm
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+
+
+class RawSubquery(RawSQL):
+    """Raw SELECT for __in lookups, which add the parentheses."""
+
+    def as_sql(self, compiler, connection):
+        # RawSQL parenthesizes itself: IN ((SELECT ...)) keeps one row
+        return self.sql, self.params
+
+
+def tokenize(text):
+    """Lower-cased words of a text, as the unicode61 FTS5 tokenizer."""
+    return [
+        token for token in TOKEN_RE.findall(text.casefold())
+        if len(token) <= MAX_TERM_LENGTH
+    ]
+
+
+def document(obj):
+    """(post id, comment id, text) of an indexed Post or Comment."""
+    if isinstance(obj, Comment):
+        return obj.post_id, obj.pk, obj.text
+    return obj.pk, None, obj.text
+
+
+class FTS5Index:
+    """SQLite FTS5 table: posts at rowid 2*id, comments at 2*id + 1."""
+    table = 'post_search'
+
+    @staticmethod
+    def rowid(obj):
+        if isinstance(obj, Comment):
+            return obj.pk * 2 + 1
+        return obj.pk * 2
+
+    def add(self, obj):
+        post_id, comment_id, text = document(obj)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [self.rowid(obj)])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, body, post_id) '
+                f'VALUES (%s, %s, %s)',
+                [self.rowid(obj), text, post_id])
+
+    def add_many(self, objs):
+        """add() of a batch of new posts or comments."""
+        rows = [(self.rowid(obj), document(obj)) for obj in objs]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, body, post_id) '
+                f'VALUES (%s, %s, %s)',
+                [(rowid, text, post_id)
+                 for rowid, (post_id, _, text) in rows])
+
+    def remove(self, obj):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [self.rowid(obj)])
+
+    def rebuild(self, batch_size=None):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, body, post_id) '
+                f'SELECT id * 2, text, id FROM "{Post._meta.db_table}"')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, body, post_id) '
+                f'SELECT id * 2 + 1, text, post_id '
+                f'FROM "{Comment._meta.db_table}"')
+
+    def post_ids(self, terms, comments=True):
+        # every term quoted: user input never reaches the FTS5 syntax
+        match = ' '.join('"{}"'.format(term) for term in terms)
+        sql = (f'SELECT post_id FROM {self.table} '
+               f'WHERE {self.table} MATCH %s')
+        if not comments:
+            sql += ' AND rowid %% 2 = 0'
+        return RawSubquery(sql, [match])
+
+
+class InvertedIndex:
+    """Pure Python index stored in SearchTerm rows."""
+
+    @staticmethod
+    def entries(obj):
+        post_id, comment_id, text = document(obj)
+        return [
+            SearchTerm(term=term, post_id=post_id, comment_id=comment_id)
+            for term in set(tokenize(text))
+        ]
+
+    def add(self, obj):
+        self.remove(obj)
+        SearchTerm.objects.bulk_create(self.entries(obj))
+
+    def add_many(self, objs):
+        """add() of a batch of new posts or comments."""
+        SearchTerm.objects.bulk_create(
+            entry for obj in objs for entry in self.entries(obj))
+
+    def remove(self, obj):
+        post_id, comment_id, _ = document(obj)
+        SearchTerm.objects.filter(
+            post_id=post_id, comment_id=comment_id).delete()
+
+    def rebuild(self, batch_size=1000):
+        SearchTerm.objects.all().delete()
+        for model in (Post, Comment):
+            entries = []
+            for obj in model.objects.iterator(chunk_size=batch_size):
+                entries.extend(self.entries(obj))
+                if len(entries) >= batch_size:
+                    SearchTerm.objects.bulk_create(entries)
+                    entries = []
+            SearchTerm.objects.bulk_create(entries)
+
+    def post_ids(self, terms, comments=True):
+        terms = set(terms)
+        matches = SearchTerm.objects.filter(term__in=terms)
+        if not comments:
+            matches = matches.filter(comment__isnull=True)
+        # all the terms must be found in the same post or comment
+        return (
+            matches.values('post_id', 'comment_id')
+            .annotate(found=Count('term', distinct=True))
+            .filter(found=len(terms))
+            .values('post_id')
+        )
+
+
+def get_index():
+    """The FTS5 index on SQLite, the inverted index elsewhere."""
+    backend = settings.SEARCH_BACKEND
+    if backend == 'auto':
+        backend = 'fts5' if connection.vendor == 'sqlite' else 'python'
+    return FTS5Index() if backend == 'fts5' else InvertedIndex()
+
+
+def search_posts(query, comments=True):
+    """Posts whose text, or one of whose comments, has every word."""
+    terms = tokenize(query)
+    if not terms:
+        return Post.objects.none()
+    return Post.objects.filter(
+        pk__in=get_index().post_ids(terms, comments=comments))
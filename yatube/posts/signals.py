@@ -0,0 +1,108 @@
+from django.db.models import Case, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import Profile
+
+from .cache import bump_feed_generations, feed_scopes, forget_follow_state
+from .models import Comment, DeletedPost, Follow, Post
+from .search import get_index
+from .timeline import fan_out
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, **kwargs):
+    """Increments the post counter of the author."""
+    if created:
+        Profile.objects.bump(instance.author_id, 'post_count')
+
+
+@receiver(post_save, sender=Post)
+def deliver_created_post(sender, instance, created, **kwargs):
+    """Pushes a new post into the timelines of the followers."""
+    if created:
+        fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    """Decrements the post counter of the author."""
+    Profile.objects.bump(instance.author_id, 'post_count', -1)
+
+
+@receiver(post_delete, sender=Post)
+def record_deleted_post(sender, instance, **kwargs):
+    """Leaves a tombstone for clients that sync changes."""
+    DeletedPost.objects.create(post_id=instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, **kwargs):
+    """Adds the comment to the activity of its post."""
+    if not created:
+        return
+    # comments committed out of order never move the date back
+    Post.objects.filter(pk=instance.post_id).update(
+        comment_count=F('comment_count') + 1,
+        last_commented_at=Case(
+            When(Q(last_commented_at__gte=instance.created),
+                 then=F('last_commented_at')),
+            default=Value(instance.created),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    """Takes the comment out of the activity of its post."""
+    latest = Comment.objects.filter(
+        post=OuterRef('pk')).order_by('-created').values('created')[:1]
+    Post.objects.filter(pk=instance.post_id).update(
+        comment_count=Greatest(F('comment_count') - 1, 0),
+        last_commented_at=Subquery(latest),
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(pre_save, sender=Post)
+def invalidate_previous_group_feed(sender, instance, **kwargs):
+    """An edit that moves the post drops the old group page too."""
+    if instance.pk is None:
+        return
+    group_id = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list('group_id', flat=True).first()
+    )
+    if group_id and group_id != instance.group_id:
+        bump_feed_generations(f'group:{group_id}')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feeds(sender, instance, **kwargs):
+    """Drops the cached pages of every feed that shows the post."""
+    bump_feed_generations(*feed_scopes(instance))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_state(sender, instance, **kwargs):
+    """Drops the cached follow button state of the viewer."""
+    forget_follow_state(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def index_text(sender, instance, **kwargs):
+    """Keeps the search index in step with posts and comments."""
+    get_index().add(instance)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def unindex_text(sender, instance, **kwargs):
+    """Drops deleted posts and comments from the search index."""
+    get_index().remove(instance)
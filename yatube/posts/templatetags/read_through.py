@@ -0,0 +1,44 @@
+from django.core.cache.utils import make_template_fragment_key
+from django.template import Library, Node, TemplateSyntaxError
+
+from ..cache import read_through
+
+register = Library()
+
+
+class ReadThroughNode(Node):
+    def __init__(self, nodelist, timeout, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        if timeout is not None:
+            timeout = int(timeout)
+        key = make_template_fragment_key(
+            self.fragment_name,
+            [var.resolve(context) for var in self.vary_on])
+        return read_through(
+            key, lambda: self.nodelist.render(context), timeout,
+            prefix=self.fragment_name)
+
+
+@register.tag('readthrough')
+def do_read_through(parser, token):
+    """{% cache %} that lets one worker re-render an expired fragment.
+
+    Usage::
+
+        {% readthrough [timeout] [fragment_name] [var1] [var2] .. %}
+    """
+    nodelist = parser.parse(('endreadthrough',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.')
+    return ReadThroughNode(
+        nodelist, parser.compile_filter(tokens[1]), tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]])
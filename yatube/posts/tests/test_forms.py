@@ -112,5 +112,5 @@ class PostCreateFormTests(TestCase):
                                                     data=form_data,
                                                     follow=True)
         self.assertEqual(post.comments.count(), comment_count + 1)
-        self.assertTrue(response_auth.context['comments'].get(
-            text='all be back'))
+        self.assertIn('all be back', [
+            comment.text for comment in response_auth.context['comments']])
@@ -1,7 +1,25 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
 from django.db import IntegrityError
-from django.test import TestCase
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from tasks.models import Task
+from users.models import Profile
+
+from ..bulk import bulk_insert
+from ..models import (Comment, DeletedPost, Follow, Group, ImportedPost,
+                      Post, TimelineEntry, User)
+from ..search import search_posts
 
-from ..models import Comment, Follow, Group, Post, User
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 class PostModelTest(TestCase):
@@ -86,3 +104,263 @@ class PostModelTest(TestCase):
             Follow.objects.create(
                 user=alex,
                 author=mike)
+
+
+class PostCounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+
+    def test_counter_follows_created_and_deleted_posts(self):
+        """The post counter of the author follows the Post table."""
+        profile = Profile.objects.for_user(self.user)
+        self.assertEqual(profile.post_count, 0)
+        post = Post.objects.create(author=self.user, text='first')
+        Post.objects.create(author=self.user, text='second')
+        profile.refresh_from_db()
+        self.assertEqual(profile.post_count, 2)
+        post.delete()
+        profile.refresh_from_db()
+        self.assertEqual(profile.post_count, 1)
+
+    def test_missing_profile_is_built_from_posts(self):
+        """A profile created on first read counts the existing posts."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=str(i)) for i in range(3))
+        self.assertEqual(Profile.objects.for_user(self.user).post_count, 3)
+
+    def test_rebuild_counters_command(self):
+        """The command repairs counters that drifted from the tables."""
+        Post.objects.create(author=self.user, text='text')
+        Profile.objects.filter(user=self.user).update(post_count=42)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(Profile.objects.get(user=self.user).post_count, 1)
+
+    def test_rebuild_counters_keeps_counters_apart(self):
+        """Posts, followers and followings of a user do not multiply."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=str(i)) for i in range(2))
+        for name in ('first', 'second', 'third'):
+            follower = User.objects.create_user(username=name)
+            Follow.objects.create(user=follower, author=self.user)
+        Follow.objects.create(user=self.user, author=follower)
+        Profile.objects.filter(user=self.user).delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(
+            Profile.objects.filter(user=self.user).values_list(
+                'post_count', 'follower_count', 'following_count').get(),
+            (2, 3, 1))
+
+
+class CommentCounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='text')
+
+    def test_counter_follows_created_and_deleted_comments(self):
+        """comment_count and last_commented_at follow the comments."""
+        first = Comment.objects.create(
+            post=self.post, author=self.user, text='first')
+        last = Comment.objects.create(
+            post=self.post, author=self.user, text='last')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        self.assertEqual(self.post.last_commented_at, last.created)
+        last.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.post.last_commented_at, first.created)
+        first.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.comment_count, self.post.last_commented_at),
+            (0, None))
+
+    def test_rebuild_comment_counts_command(self):
+        """The command repairs counts that drifted from the comments."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='text')
+        Post.objects.filter(pk=self.post.pk).update(
+            comment_count=42, last_commented_at=None)
+        out = StringIO()
+        call_command('rebuild_comment_counts', batch_size=1, stdout=out)
+        self.assertIn('1 fixed', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.post.last_commented_at, comment.created)
+
+
+class UpdatedAtTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+
+    def test_changes_move_updated_at(self):
+        """Edits, comments and deleted comments move updated_at."""
+        post = Post.objects.create(author=self.user, text='text')
+        stamps = [post.updated_at]
+        post.text = 'edited'
+        post.save()
+        stamps.append(post.updated_at)
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='comment')
+        post.refresh_from_db()
+        stamps.append(post.updated_at)
+        comment.delete()
+        post.refresh_from_db()
+        stamps.append(post.updated_at)
+        self.assertEqual(stamps, sorted(set(stamps)))
+
+    def test_deleted_post_leaves_tombstone(self):
+        """A deleted post is remembered by its id."""
+        post = Post.objects.create(author=self.user, text='text')
+        post_id = post.pk
+        post.delete()
+        self.assertTrue(
+            DeletedPost.objects.filter(post_id=post_id).exists())
+
+
+class GenerateDataTest(TestCase):
+    def test_generate_data_command(self):
+        """Generated rows are consistent with counters and timelines."""
+        call_command(
+            'generate_data', users=20, groups=3, posts=200, comments=100,
+            follows=5, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertFalse(Comment.objects.filter(
+            created__lt=F('post__pub_date')).exists())
+        self.assertFalse(Post.objects.filter(
+            updated_at__lt=F('pub_date')).exists())
+        author = User.objects.annotate(
+            posts=Count('author_posts')).order_by('-posts').first()
+        self.assertEqual(
+            Profile.objects.get(user=author).post_count, author.posts)
+        follow = Follow.objects.filter(author=author).first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=follow.user, post__author=author).count(),
+            author.posts)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Group', slug='import_slug', description='')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        Profile.objects.for_user(self.author)
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        (self.directory / 'cover.gif').write_bytes(b'GIF89a')
+
+    def write(self, name, records):
+        path = self.directory / name
+        with open(path, 'a') as output:
+            for record in records:
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return str(path)
+
+    def call(self, path, **options):
+        call_command('import_posts', path, images=str(self.directory),
+                     stdout=StringIO(), stderr=StringIO(), **options)
+
+    def test_import_posts_and_comments(self):
+        """Rows are resolved by names, dates and images are kept."""
+        path = self.write('posts.jsonl', [
+            {'id': 'a1', 'author': 'leo', 'group': 'import_slug',
+             'text': 'Первый', 'pub_date': '2001-01-01T00:00:00+00:00',
+             'image': 'cover.gif'},
+            {'id': 'a2', 'author': 'nobody', 'text': 'Чужой'},
+            {'id': 'a3', 'author': 'leo', 'text': 'Второй'},
+        ])
+        self.call(path)
+        post = Post.objects.get(import_source__source_id='a1')
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2001)
+        self.assertTrue(post.image.name.startswith('posts/cover'))
+        self.assertTrue(Path(post.image.path).exists())
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Profile.objects.get(user=self.author).post_count, 2)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader).count(), 2)
+        self.assertEqual(
+            list(Task.objects.values_list('name', 'args')),
+            [('posts.thumbnails.render_thumbnail', f'[{post.pk}]')])
+        comments = self.write('comments.jsonl', [
+            {'post': 'a1', 'author': 'reader', 'text': 'Ответ'},
+            {'post': 'a9', 'author': 'reader', 'text': 'Без поста'},
+        ])
+        self.call(comments, table='comments')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(
+            list(search_posts('второй')),
+            [Post.objects.get(import_source__source_id='a3')])
+        self.assertEqual(list(search_posts('ответ')), [post])
+
+    def test_bulk_insert_skips_rows_of_others(self):
+        """Ids are matched by key, not taken from the newest rows."""
+        bulk_create = Post.objects.bulk_create
+
+        def interleaved(objs):
+            other = Post.objects.create(author=self.reader, text='Чужой')
+            bulk_create(objs)
+            other.delete()
+            Post.objects.create(author=self.reader, text='Ещё чужой')
+
+        posts = [Post(author=self.author, text=text)
+                 for text in ('Один', 'Два', 'Один')]
+        with mock.patch.object(Post.objects, 'bulk_create', interleaved):
+            bulk_insert(Post, posts, ('author_id', 'pub_date', 'text'))
+        for post in posts:
+            with self.subTest(text=post.text):
+                self.assertEqual(Post.objects.get(pk=post.pk).text,
+                                 post.text)
+        self.assertEqual(len({post.pk for post in posts}), 3)
+
+    def test_repeated_ids_are_skipped(self):
+        """A second record with an id of the same batch is skipped."""
+        path = self.write('posts.jsonl', [
+            {'id': 1, 'author': 'leo', 'text': 'Первый'},
+            {'id': 1, 'author': 'leo', 'text': 'Повтор'},
+            {'id': 2, 'author': 'leo', 'text': 'Второй'},
+        ])
+        out = StringIO()
+        call_command('import_posts', path, stdout=out, stderr=StringIO())
+        self.assertIn('Done: 2 imported, 1 skipped.', out.getvalue())
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Второй', 'Первый'])
+
+    def test_import_resumes_after_last_batch(self):
+        """A second run skips the records committed by the first."""
+        records = [
+            {'id': str(i), 'author': 'leo', 'text': f'Пост {i}'}
+            for i in range(5)
+        ]
+        path = self.write('posts.jsonl', records[:3])
+        self.call(path, batch_size=2)
+        self.write('posts.jsonl', records[3:])
+        self.call(path, batch_size=2)
+        self.assertEqual(
+            sorted(ImportedPost.objects.values_list(
+                'source_id', flat=True)),
+            ['0', '1', '2', '3', '4'])
+        self.assertEqual(Post.objects.count(), 5)
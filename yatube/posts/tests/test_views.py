@@ -1,14 +1,35 @@
+import csv
+import gzip
+import json
 import shutil
 import tempfile
+import threading
+import time
+from base64 import urlsafe_b64encode
+from io import StringIO
+from pathlib import Path
 
 from django import forms
 from django.conf import settings
+from django.contrib.admin import helpers
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post, User
+from tasks.models import Task
+from users.models import Profile
+
+from ..cache import LOCK_KEY, cache_metrics, read_through, reset_metrics
+from ..models import (Comment, Follow, Group, ModerationJob, Post,
+                      TimelineEntry, User)
+from ..moderation import run_job
+from ..paginators import EstimatedCountPaginator
+from ..thumbnails import render_thumbnail
+from ..timeline import backfill
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -104,13 +125,50 @@ class PostsVIEWSTests(TestCase):
                 self.assertEqual(post_text_0, self.post.text)
                 self.assertEqual(post_author_0, self.post.author.username)
                 self.assertEqual(post_group_0, self.post.group.title)
-            with self.subTest(template=template + '?page=2'):
-                response = self.authorized_client.get(reverse_name + '?page=2')
+            with self.subTest(template=template + '?after='):
+                next_token = response.context['page_obj'].next_token
+                response = self.authorized_client.get(
+                    reverse_name + '?after=' + next_token)
                 if template == 'posts/group_list.html':
                     self.assertEqual(len(response.context['page_obj']), 4)
                 else:
                     self.assertEqual(len(response.context['page_obj']), 5)
 
+    def test_cursor_pagination_round_trip(self):
+        """The before token of the second page leads back to the first."""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url).context['page_obj']
+        self.assertIsNone(first.previous_token)
+        second = self.guest_client.get(
+            url + '?after=' + first.next_token).context['page_obj']
+        self.assertIsNone(second.next_token)
+        self.assertNotIn(second[0], first.object_list)
+        back = self.guest_client.get(
+            url + '?before=' + second.previous_token).context['page_obj']
+        self.assertEqual(back.object_list, first.object_list)
+
+    def test_cursor_pagination_broken_token(self):
+        """A broken token falls back to the first page."""
+        response = self.guest_client.get(
+            reverse('posts:index') + '?after=broken')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'][0], self.post)
+
+    def test_cursor_pagination_null_token(self):
+        """A well-formed token of nulls falls back to the first page."""
+        token = urlsafe_b64encode(b'[null,null]').decode().rstrip('=')
+        for param in ('after', 'before'):
+            with self.subTest(param=param):
+                response = self.guest_client.get(
+                    reverse('posts:index') + f'?{param}={token}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['page_obj'][0], self.post)
+        for url in (reverse('api:index'), reverse(
+                'posts:post_comments', kwargs={'post_id': self.post.pk})):
+            with self.subTest(url=url):
+                response = self.guest_client.get(f'{url}?after={token}')
+                self.assertEqual(response.status_code, 200)
+
     def test_create_edit_pages_show_correct_context(self):
         """Check form fields."""
         templates_page_names = {
@@ -175,13 +233,55 @@ class PostsVIEWSTests(TestCase):
         response = self.authorized_client.get(reverse('posts:index'))
         control_text = Post.objects.get(pk=self.post.pk).text
         self.assertIn(control_text, response.content.decode('utf-8'))
-        Post.objects.get(pk=self.post.pk).delete()
+        Post.objects.filter(pk=self.post.pk).update(text='changed quietly')
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertIn(control_text, response.content.decode('utf-8'))
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertNotIn(control_text, response.content.decode('utf-8'))
 
+    def test_cache_index_dropped_on_post_changes(self):
+        """Created, edited and deleted posts show up at once."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        post = Post.objects.create(author=self.user, text='fresh post')
+        self.assertIn('fresh post', self.guest_client.get(url)
+                      .content.decode('utf-8'))
+        post.text = 'edited post'
+        post.save()
+        self.assertIn('edited post', self.guest_client.get(url)
+                      .content.decode('utf-8'))
+        post.delete()
+        self.assertNotIn('edited post', self.guest_client.get(url)
+                         .content.decode('utf-8'))
+
+    def test_cache_keyed_by_page(self):
+        """The second page is not served from the first page fragment."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                page_obj = response.context['page_obj']
+                response = self.guest_client.get(
+                    url + '?after=' + page_obj.next_token)
+                self.assertNotIn(page_obj[0].text,
+                                 response.content.decode('utf-8'))
+
+    def test_cache_group_dropped_when_post_moves(self):
+        """Moving a post to another group drops the old group page."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        other = Group.objects.create(title='Другая', slug='other_slug',
+                                     description='Другое описание')
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = other
+        post.save()
+        self.assertNotIn(post.text, self.guest_client.get(url)
+                         .content.decode('utf-8'))
+
     def test_follow_add_delete(self):
         """An authorized user can subscribe to other
         users and remove them from subscriptions."""
@@ -217,3 +317,907 @@ class PostsVIEWSTests(TestCase):
         self.authorized_client.force_login(self.tom)
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertIn(text, response.content.decode('utf-8'))
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(author=cls.author, text='old')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow_feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Following copies old posts, unfollowing removes them."""
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': self.author}))
+        self.assertEqual(self.follow_feed(), [self.old_post])
+        self.assertEqual(
+            Profile.objects.for_user(self.author).follower_count, 1)
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': self.author}))
+        self.assertEqual(self.follow_feed(), [])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(
+            Profile.objects.for_user(self.author).follower_count, 0)
+
+    def test_new_post_fanned_out(self):
+        """A new post is written to the timeline of every follower."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='new')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.follow_feed(), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_read_on_demand(self):
+        """Posts of popular authors are not copied but still shown."""
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': self.author}))
+        post = Post.objects.create(author=self.author, text='new')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(self.follow_feed(), [post, self.old_post])
+
+
+class FeedQueryBudgetTests(TestCase):
+    """Feed pages run a fixed number of queries whatever the page size."""
+    QUERY_BUDGET = {
+        'posts:index': 1,
+        'posts:group_list': 2,
+        'posts:profile': 4,
+        # marking the new posts read
+        'posts:follow_index': 2,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Leo', last_name='Tolstoy')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='budget_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {i}')
+            for i in range(settings.PAGINATOR_COUNT)
+        )
+        backfill(cls.reader, cls.author)
+        Profile.objects.for_user(cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': self.author}),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def test_feed_query_budget(self):
+        """Every feed page stays within its query budget, the same for a
+        short and a full page, so no query runs per row."""
+        for per_page in (2, settings.PAGINATOR_COUNT):
+            for name, url in self.urls.items():
+                with self.subTest(page=name, per_page=per_page), \
+                        override_settings(PAGINATOR_COUNT=per_page):
+                    cache.clear()
+                    # session and user lookups of the logged in reader
+                    budget = self.QUERY_BUDGET[name] + 2
+                    with self.assertNumQueries(budget):
+                        response = self.client.get(url)
+                    self.assertEqual(
+                        len(response.context['page_obj']), per_page)
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{i}') for i in range(3)
+        ]
+        cls.post = Post.objects.create(author=cls.author, text='Вирусный')
+        for i in range(12):
+            Comment.objects.create(
+                post=cls.post, author=cls.readers[i % 3], text=f'Ответ {i}')
+        cls.texts = [f'Ответ {i}' for i in range(12)]
+
+    def setUp(self):
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.more_url = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk})
+
+    def test_first_comments_on_post_detail(self):
+        """post_detail shows the oldest comments and a load more link."""
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual([c.text for c in comments], self.texts[:5])
+        self.assertContains(response, comments.next_token)
+        response = self.client.get(
+            self.detail_url, {'after': comments.next_token})
+        self.assertEqual([c.text for c in response.context['comments']],
+                         self.texts[5:10])
+
+    def test_load_more_endpoint(self):
+        """The JSON endpoint walks through the rest of the comments."""
+        token = self.client.get(self.detail_url).context[
+            'comments'].next_token
+        texts = []
+        while token:
+            with self.assertNumQueries(2):
+                data = self.client.get(self.more_url, {'after': token}).json()
+            texts.extend(comment['text'] for comment in data['comments'])
+            token = data['next']
+        self.assertEqual(texts, self.texts[5:])
+        self.assertEqual(data['comments'][-1]['author'], 'reader2')
+        self.assertEqual(data['comments'][-1]['author_url'],
+                         reverse('posts:profile', args=['reader2']))
+
+    def test_load_more_missing_post(self):
+        """Comments of a missing post are a 404."""
+        response = self.client.get(reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk + 100}))
+        self.assertEqual(response.status_code, 404)
+
+
+class FollowStateTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': self.author})
+
+    def following(self, client=None):
+        response = (client or self.client).get(self.profile_url)
+        return response.context['following']
+
+    def test_follow_state_per_viewer(self):
+        """The button follows the viewer's own subscription."""
+        self.assertIs(self.following(), False)
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': self.author}))
+        self.assertIs(self.following(), True)
+        other = Client()
+        other.force_login(self.other)
+        self.assertIs(self.following(other), False)
+        self.assertIs(self.following(Client()), False)
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': self.author}))
+        self.assertIs(self.following(), False)
+
+    def test_follow_state_is_cached(self):
+        """The existence check is not repeated for the same viewer."""
+        self.assertIs(self.following(), False)
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)])
+        self.assertIs(self.following(), False)
+
+    def test_follow_counters(self):
+        """Both sides of a subscription are counted once."""
+        follow_url = reverse('posts:profile_follow',
+                             kwargs={'username': self.author})
+        unfollow_url = reverse('posts:profile_unfollow',
+                               kwargs={'username': self.author})
+        self.client.get(follow_url)
+        self.client.get(follow_url)
+        counts = (
+            Profile.objects.for_user(self.author).follower_count,
+            Profile.objects.for_user(self.reader).following_count,
+        )
+        self.assertEqual(counts, (1, 1))
+        self.assertContains(self.client.get(self.profile_url),
+                            'Подписчиков: 1, подписок: 0')
+        self.client.get(unfollow_url)
+        self.assertEqual(self.client.get(unfollow_url).status_code, 404)
+        counts = (
+            Profile.objects.for_user(self.author).follower_count,
+            Profile.objects.for_user(self.reader).following_count,
+        )
+        self.assertEqual(counts, (0, 0))
+
+
+class FollowBatchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(4)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+            Profile.objects.for_user(author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+        self.url = reverse('posts:follow_batch')
+
+    def batch(self, **data):
+        return self.client.post(
+            self.url, json.dumps(data), content_type='application/json')
+
+    def follower_counts(self):
+        return [
+            Profile.objects.get(user=author).follower_count
+            for author in self.authors
+        ]
+
+    def test_batch_follow_is_idempotent(self):
+        """Repeated, self and unknown usernames are skipped."""
+        names = ['author0', 'author1', 'author2', 'reader', 'nobody']
+        data = self.batch(follow=names).json()
+        self.assertEqual(data['followed'], ['author0', 'author1', 'author2'])
+        self.assertEqual(data['missing'], ['nobody'])
+        self.assertEqual(data['following_count'], 3)
+        data = self.batch(follow=names).json()
+        self.assertEqual(data['followed'], [])
+        self.assertEqual(data['following_count'], 3)
+        self.assertEqual(self.follower_counts(), [1, 1, 1, 0])
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 3)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader).count(), 3)
+
+    def test_batch_follow_and_unfollow(self):
+        """Both lists are applied in one request."""
+        self.batch(follow=['author0', 'author1'])
+        self.assertTrue(self.client.get(reverse(
+            'posts:profile', kwargs={'username': 'author0'}
+        )).context['following'])
+        data = self.batch(follow=['author3'],
+                          unfollow=['author0', 'author2']).json()
+        self.assertEqual(data['followed'], ['author3'])
+        self.assertEqual(data['unfollowed'], ['author0'])
+        self.assertEqual(data['following_count'], 2)
+        self.assertEqual(self.follower_counts(), [0, 1, 0, 1])
+        self.assertFalse(self.client.get(reverse(
+            'posts:profile', kwargs={'username': 'author0'}
+        )).context['following'])
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader, post__author=self.authors[0]).exists())
+
+    def test_batch_rejects_bad_requests(self):
+        """Broken bodies and oversized batches are a 400."""
+        for body in ('not json', '[]', '{"follow": "author0"}',
+                     '{"follow": [1]}'):
+            with self.subTest(body=body):
+                response = self.client.post(
+                    self.url, body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        with override_settings(FOLLOW_BATCH_LIMIT=2):
+            response = self.batch(follow=['author0', 'author1', 'author2'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class ConditionalPageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='conditional_slug',
+            description='Тестовое описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+
+    def etags(self):
+        return [self.client.get(url)['ETag'] for url in self.urls]
+
+    def test_anonymous_pages_revalidate(self):
+        """An unchanged page is a public 304 for guests."""
+        for url, etag in zip(self.urls, self.etags()):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn(
+                    f'max-age={settings.PAGE_CACHE_MAX_AGE}',
+                    response['Cache-Control'])
+
+    def test_changes_move_etags(self):
+        """Edits and comments make the pages showing them stale."""
+        etags = self.etags()
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        edited = self.etags()
+        for url, old, new in zip(self.urls, etags, edited):
+            with self.subTest(url=url):
+                self.assertNotEqual(old, new)
+        Comment.objects.create(post=post, author=self.author, text='Ответ')
+        for url, old, new in zip(self.urls, edited, self.etags()):
+            with self.subTest(url=url):
+                self.assertNotEqual(old, new)
+
+    def test_comment_refreshes_cached_feed(self):
+        """A new comment re-renders the cached cards of its post."""
+        self.assertContains(
+            self.client.get(self.urls[0]), 'Комментариев: 0')
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Ответ')
+        self.assertContains(
+            self.client.get(self.urls[0]), 'Комментариев: 1')
+
+    def test_missing_pages_are_not_cached(self):
+        """A 404 carries no validator."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_logged_in_pages_stay_private(self):
+        """Pages of a logged in user are private and rendered anew."""
+        self.client.force_login(self.author)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertFalse(response.has_header('ETag'))
+
+
+class DiscussedFeedTests(TestCase):
+    def test_most_discussed_first(self):
+        """The discussed feed orders posts by their comment count."""
+        user = User.objects.create_user(username='reader')
+        quiet, busy, middle = (
+            Post.objects.create(author=user, text=text)
+            for text in ('quiet', 'busy', 'middle'))
+        for post, count in ((busy, 3), (middle, 1)):
+            for i in range(count):
+                Comment.objects.create(post=post, author=user, text=str(i))
+        response = self.client.get(reverse('posts:discussed'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [busy, middle, quiet])
+        self.assertContains(response, 'Комментариев: 3')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='painter')
+        cls.small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', self.small_gif,
+                                     content_type='image/gif'),
+        )
+
+    def test_render_thumbnail_stores_path_and_size(self):
+        """The rendered thumbnail is stored on the post and shown."""
+        render_thumbnail(self.post.pk)
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.thumbnail)
+        self.assertEqual(
+            (self.post.thumbnail_width, self.post.thumbnail_height),
+            (960, 339))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.thumbnail.url)
+
+    def test_render_thumbnail_stores_responsive_variants(self):
+        """Every width is rendered and listed in the srcset."""
+        render_thumbnail(self.post.pk)
+        self.post.refresh_from_db()
+        srcset = self.post.picture_sources[0]['srcset']
+        for width in settings.POST_IMAGE_WIDTHS:
+            with self.subTest(width=width):
+                self.assertIn(f'?v={self.post.version} {width}w', srcset)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, srcset)
+
+    def test_original_image_shown_until_thumbnail_is_ready(self):
+        """A post without a thumbnail falls back to the uploaded image."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+
+    def test_new_post_queues_thumbnail_for_worker(self):
+        """The request only queues the rendering, a worker does it."""
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'Ещё картинка',
+            'image': SimpleUploadedFile(
+                'queued.gif', self.small_gif, content_type='image/gif'),
+        })
+        post = Post.objects.get(text='Ещё картинка')
+        self.assertFalse(post.thumbnail)
+        self.assertEqual(
+            Task.objects.values_list('name', 'args').get(),
+            ('posts.thumbnails.render_thumbnail', f'[{post.pk}]'))
+        call_command('run_tasks', burst=True, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail)
+
+    def test_edit_with_new_image_drops_thumbnail(self):
+        """Replacing the image forgets the thumbnail of the old one."""
+        render_thumbnail(self.post.pk)
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={
+                'text': 'Новая картинка',
+                'image': SimpleUploadedFile(
+                    'other.gif', self.small_gif, content_type='image/gif'),
+            })
+        self.post.refresh_from_db()
+        self.assertFalse(self.post.thumbnail)
+        self.assertIsNone(self.post.thumbnail_width)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.client = Client()
+        self.anna = Post.objects.create(
+            author=self.user, text='Все счастливые семьи похожи')
+        self.war = Post.objects.create(
+            author=self.user, text='Война и мир')
+        Comment.objects.create(
+            post=self.war, author=self.user, text='Похожи на роман')
+
+    def found(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return set(response.context['page_obj'])
+
+    def check_backend(self):
+        self.assertEqual(self.found('семьи'), {self.anna})
+        self.assertEqual(self.found('ПОХОЖИ'), {self.anna, self.war})
+        self.assertEqual(self.found('похожи роман'), {self.war})
+        self.assertEqual(self.found('"OR*'), set())
+        self.assertEqual(self.found(''), set())
+        self.anna.text = 'Анна Каренина'
+        self.anna.save()
+        self.assertEqual(self.found('семьи'), set())
+        self.war.comments.all().delete()
+        self.assertEqual(self.found('роман'), set())
+
+    def test_fts5_search(self):
+        """FTS5 finds posts by the words of their text and comments."""
+        self.check_backend()
+
+    @override_settings(SEARCH_BACKEND='python')
+    def test_inverted_index_search(self):
+        """The Python index finds the same posts as FTS5."""
+        self.anna.save()
+        self.war.save()
+        for comment in Comment.objects.all():
+            comment.save()
+        self.check_backend()
+
+    def test_rebuild_search_index(self):
+        """Rows written around the signals are found after a rebuild."""
+        Post.objects.bulk_create([Post(author=self.user, text='Воскресение')])
+        post = Post.objects.get(text='Воскресение')
+        self.assertEqual(self.found('воскресение'), set())
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('воскресение'), {post})
+
+    def test_admin_search_uses_index(self):
+        """The admin changelist finds post texts through the index."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'семьи'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.anna])
+
+
+class FeedIndexTests(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """The query plan of every feed uses its composite index."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Тестовая группа', slug='index_slug', description='')
+        post = Post.objects.create(author=author, group=group, text='text')
+        Comment.objects.create(post=post, author=reader, text='comment')
+        Follow.objects.create(user=reader, author=author)
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        self.assertIn('Every feed uses its index.', out.getvalue())
+
+
+class ReadThroughCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_metrics()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'value {self.calls}'
+
+    def test_value_computed_once(self):
+        """Reads after the first one are hits."""
+        for _ in range(3):
+            self.assertEqual(
+                read_through('test:key', self.compute, 60), 'value 1')
+        metrics = cache_metrics()['test']
+        self.assertEqual((metrics['miss'], metrics['hit']), (1, 2))
+
+    def test_stale_value_served_during_recompute(self):
+        """Another worker recomputing an expired key is not waited for."""
+        cache.set('test:key', ('old', 0.1, time.time() - 1), 60)
+        cache.add(LOCK_KEY.format('test:key'), True, 10)
+        self.assertEqual(read_through('test:key', self.compute, 60), 'old')
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(cache_metrics()['test']['stale'], 1)
+
+    @override_settings(CACHE_EARLY_EXPIRY_BETA=10 ** 9)
+    def test_early_expiry(self):
+        """A slow value is recomputed before it expires."""
+        cache.set('test:key', ('old', 1, time.time() + 60), 60)
+        self.assertEqual(
+            read_through('test:key', self.compute, 60), 'value 1')
+        self.assertEqual(cache_metrics()['test']['early'], 1)
+
+    @override_settings(CACHE_EARLY_EXPIRY_BETA=0)
+    def test_no_early_expiry(self):
+        """With beta 0 a value lives its whole timeout."""
+        cache.set('test:key', ('old', 1, time.time() + 60), 60)
+        self.assertEqual(read_through('test:key', self.compute, 60), 'old')
+
+    def test_concurrent_miss_waits_for_worker(self):
+        """A missing key being computed elsewhere is waited for."""
+        lock = LOCK_KEY.format('test:key')
+        cache.add(lock, True, 10)
+
+        def other_worker():
+            cache.set('test:key', ('theirs', 0.1, time.time() + 60), 60)
+            cache.delete(lock)
+
+        timer = threading.Timer(0.1, other_worker)
+        timer.start()
+        self.assertEqual(
+            read_through('test:key', self.compute, 60), 'theirs')
+        timer.join()
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(cache_metrics()['test']['wait'], 1)
+
+    def test_fragment_metrics(self):
+        """Feed fragments are counted under their fragment name."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(cache_metrics()['index_page']['hit'], 1)
+        out = StringIO()
+        call_command('cache_stats', stdout=out)
+        self.assertIn('index_page', out.getvalue())
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='export_slug', description='')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост, {i}')
+            for i in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.staff, text='Комментарий')
+        Follow.objects.create(user=cls.staff, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.staff)
+
+    def export(self, table, **params):
+        response = self.client.get(
+            reverse('posts:export', args=[table]), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_export_is_for_staff(self):
+        """Other users are sent to the admin login."""
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('posts:export', args=['posts']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_csv_in_batches(self):
+        """Every row is exported, whatever the batch size."""
+        with self.settings(EXPORT_BATCH_SIZE=2):
+            content = self.export('posts').decode()
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertEqual(
+            [row['text'] for row in rows],
+            [post.text for post in self.posts])
+        self.assertEqual(rows[0]['group'], self.group.slug)
+        self.assertEqual(rows[0]['author'], self.author.username)
+
+    def test_jsonl_since_and_gzip(self):
+        """Incremental gzipped JSON lines hold only the newer rows."""
+        since = self.posts[2].updated_at.isoformat()
+        content = gzip.decompress(
+            self.export('posts', format='jsonl', since=since, gzip=1))
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        # the comment on the first post is a change after the date
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [post.pk for post in (self.posts[0], *self.posts[3:])])
+        rows = self.export('follows', format='jsonl').decode().splitlines()
+        self.assertEqual(
+            json.loads(rows[0])['author'], self.author.username)
+
+    def test_bad_requests(self):
+        """Unknown tables are 404, since on follows is a 400."""
+        url = reverse('posts:export', args=['users'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        url = reverse('posts:export', args=['follows'])
+        response = self.client.get(url, {'since': '2020-01-01'})
+        self.assertEqual(response.status_code, 400)
+        url = reverse('posts:export', args=['posts'])
+        for since in ('yesterday', '2020-13-01T00:00'):
+            with self.subTest(since=since):
+                response = self.client.get(url, {'since': since})
+                self.assertEqual(response.status_code, 400)
+
+    def test_empty_since_exports_everything(self):
+        rows = list(csv.DictReader(
+            self.export('posts', since='').decode().splitlines()))
+        self.assertEqual(len(rows), len(self.posts))
+
+    def test_export_command(self):
+        """The command writes the same export to a file or stdout."""
+        out = StringIO()
+        call_command('export', 'comments', stdout=out)
+        self.assertIn('Комментарий', out.getvalue())
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'groups.csv.gz')
+            call_command('export', 'groups', gzip=True, output=str(path))
+            with gzip.open(path, 'rt') as export:
+                self.assertIn(self.group.slug, export.read())
+
+
+class AdminPerformanceTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.author = User.objects.create_user(username='author')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'admin-{i}', description='')
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_posts(self, count):
+        posts = [
+            Post.objects.create(
+                author=self.author, group=self.groups[0], text=f'Пост {i}')
+            for i in range(count)
+        ]
+        for post in posts:
+            Comment.objects.create(
+                post=post, author=self.admin, text='Комментарий')
+        return posts
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        """The query count of a changelist does not grow with its rows."""
+        Follow.objects.create(user=self.admin, author=self.author)
+        urls = [
+            reverse(f'admin:posts_{model}_changelist')
+            for model in ('post', 'comment', 'follow')
+        ]
+        self.add_posts(2)
+        before = [self.queries(url) for url in urls]
+        self.add_posts(10)
+        self.assertEqual([self.queries(url) for url in urls], before)
+
+    def test_editable_group_is_not_a_select_of_every_group(self):
+        """Only the group of the row is rendered in its widget."""
+        self.add_posts(1)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, 'Группа 0')
+        self.assertNotContains(response, 'Группа 4')
+
+    def test_group_edited_in_changelist(self):
+        """The autocomplete of a row still saves any group."""
+        post, = self.add_posts(1)
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'), {
+                'form-TOTAL_FORMS': 1,
+                'form-INITIAL_FORMS': 1,
+                'form-0-id': post.pk,
+                'form-0-group': self.groups[4].pk,
+                '_save': 'Сохранить',
+            })
+        self.assertEqual(response.status_code, 302)
+        post.refresh_from_db()
+        self.assertEqual(post.group, self.groups[4])
+
+    def test_date_hierarchy(self):
+        """Posts are drilled down by the year of publication."""
+        post, = self.add_posts(1)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'),
+            {'pub_date__year': post.pub_date.year})
+        self.assertEqual(list(response.context['cl'].result_list), [post])
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=3)
+    def test_estimated_count(self):
+        """Past the limit the table is estimated, a filter capped."""
+        posts = self.add_posts(5)
+        self.assertEqual(
+            EstimatedCountPaginator(Post.objects.all(), 2).count,
+            posts[-1].pk)
+        self.assertEqual(
+            EstimatedCountPaginator(
+                Post.objects.filter(author=self.author), 2).count, 3)
+        self.assertEqual(
+            EstimatedCountPaginator(
+                Post.objects.filter(pk=posts[0].pk), 2).count, 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MODERATION_CHUNK_SIZE=2)
+class ModerationJobTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Куда', slug='moderation_slug', description='')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.spam = [
+            Post.objects.create(author=self.spammer, text=f'Спам {i}')
+            for i in range(5)
+        ]
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(
+            post=self.spam[0], author=self.author, text='Ответ')
+
+    def action(self, action, posts, **data):
+        return self.client.post(
+            reverse('admin:posts_post_changelist'), {
+                'action': action,
+                'index': 0,
+                helpers.ACTION_CHECKBOX_NAME: [post.pk for post in posts],
+                **data,
+            })
+
+    def test_delete_author_posts(self):
+        """The job deletes every post of the author in chunks."""
+        image = SimpleUploadedFile(
+            'spam.gif', b'GIF89a', content_type='image/gif')
+        post = self.spam[-1]
+        post.image = image
+        post.save()
+        image_path = Path(post.image.path)
+        self.assertTrue(image_path.exists())
+        self.assertEqual(
+            self.action('delete_author_posts', self.spam[:1]).status_code,
+            302)
+        job = ModerationJob.objects.get()
+        self.assertEqual(
+            (job.status, job.author, job.total),
+            (ModerationJob.QUEUED, self.spammer, 5))
+        self.assertEqual(
+            Task.objects.values_list('name', 'args').get(),
+            ('posts.moderation.run_job', f'[{job.pk}]'))
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.progress),
+                         (ModerationJob.DONE, 5, 100))
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertFalse(image_path.exists())
+
+    def test_move_to_group(self):
+        """The group is asked for, then the job moves the posts."""
+        response = self.action('move_to_group', self.spam[:3])
+        self.assertContains(response, 'Постов к переносу: 3')
+        response = self.action(
+            'move_to_group', self.spam[:3],
+            apply='Перенести', group=self.group.pk)
+        self.assertEqual(response.status_code, 302)
+        job = ModerationJob.objects.get()
+        run_job(job.pk)
+        self.assertEqual(
+            set(self.group.community.all()), set(self.spam[:3]))
+
+    def test_failed_job_resumes_after_last_chunk(self):
+        """A job run again goes on from its committed position."""
+        ModerationJob.objects.create(
+            action=ModerationJob.MOVE_TO_GROUP, group=self.group,
+            post_ids=json.dumps([post.pk for post in self.spam]),
+            total=5, status=ModerationJob.RUNNING,
+            last_pk=self.spam[1].pk, processed=2)
+        run_job(ModerationJob.objects.get().pk)
+        job = ModerationJob.objects.get()
+        self.assertEqual((job.status, job.processed),
+                         (ModerationJob.DONE, 5))
+        self.assertEqual(
+            set(self.group.community.all()), set(self.spam[2:]))
+
+    def test_progress_shown_in_admin(self):
+        """Moderators see how far every job went."""
+        ModerationJob.objects.create(
+            action=ModerationJob.DELETE_AUTHOR_POSTS, author=self.spammer,
+            total=4, processed=1)
+        response = self.client.get(
+            reverse('admin:posts_moderationjob_changelist'))
+        self.assertContains(response, '1 / 4 (25%)')
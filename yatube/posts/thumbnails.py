@@ -0,0 +1,55 @@
+import json
+import logging
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from tasks.queue import task
+
+from .cache import bump_feed_generations, feed_scopes
+from .images import feed_size, render_variants
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+@task(max_attempts=3)
+def render_thumbnail(post_id):
+    """Renders the image variants of a post and stores the feed thumbnail.
+
+    The thumbnail is the JPEG variant of POST_THUMBNAIL_GEOMETRY width.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    variants = render_variants(post)
+    width, _ = feed_size()
+    thumbnail = next(
+        variant for variant in variants
+        if variant['type'] == 'image/jpeg' and variant['width'] == width
+    )
+    # the image may have been replaced while the variants were rendered
+    updated = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnail=thumbnail['name'],
+        thumbnail_width=thumbnail['width'],
+        thumbnail_height=thumbnail['height'],
+        image_variants=json.dumps(variants),
+        updated_at=timezone.now(),
+    )
+    if updated:
+        bump_feed_generations(*feed_scopes(post))
+
+
+def render_thumbnail_in_worker(post_id):
+    """Pool task: failures are logged, not raised."""
+    try:
+        render_thumbnail(post_id)
+    except Exception:
+        logger.exception('Thumbnail of post %s failed', post_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_thumbnail(post):
+    """Queues the rendering; a worker picks it up once the post commits."""
+    render_thumbnail.delay(post.pk)
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db.models import Q
+
+from users.models import Profile
+
+from .models import Follow, Post, TimelineEntry
+
+
+def fan_out(post):
+    """Delivers a new post to the timelines of the author's followers.
+
+    Authors with more than TIMELINE_FANOUT_LIMIT followers are skipped,
+    their posts are read from the Post table when the feed is built.
+    """
+    author = Profile.objects.for_user(post.author)
+    if author.follower_count > settings.TIMELINE_FANOUT_LIMIT:
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post)
+         for user_id in followers.iterator()),
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_many(posts):
+    """fan_out() of a batch of posts in two queries."""
+    authors = {post.author_id for post in posts}
+    popular = Profile.objects.filter(
+        user_id__in=authors,
+        follower_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('user_id', flat=True)
+    followers = {}
+    for user_id, author_id in Follow.objects.filter(
+            author_id__in=authors - set(popular)).values_list(
+                'user_id', 'author_id'):
+        followers.setdefault(author_id, []).append(user_id)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post)
+         for post in posts
+         for user_id in followers.get(post.author_id, ())),
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user, *authors):
+    """Copies the latest posts of just followed authors."""
+    entries = []
+    for author in authors:
+        posts = Post.objects.filter(author=author).order_by(
+            '-pub_date').values_list('pk', flat=True)
+        entries.extend(
+            TimelineEntry(user=user, post_id=post_id)
+            for post_id in posts[:settings.TIMELINE_BACKFILL])
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def prune(user, *authors):
+    """Removes the posts of unfollowed authors."""
+    TimelineEntry.objects.filter(
+        user=user, post__author__in=authors).delete()
+
+
+def timeline_posts(user):
+    """Subscription feed: the timeline plus posts of popular authors."""
+    delivered = TimelineEntry.objects.filter(user=user).values('post_id')
+    popular = user.follower.filter(
+        author__profile__follower_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values('author_id')
+    return Post.objects.feed().filter(
+        Q(pk__in=delivered) | Q(author__in=popular))
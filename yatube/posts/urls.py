@@ -11,8 +11,14 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/comment', views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('create/', views.post_create, name='post_create'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/batch/', views.follow_batch, name='follow_batch'),
+    path('search/', views.search, name='search'),
+    path('discussed/', views.discussed, name='discussed'),
+    path('export/<str:table>/', views.export, name='export'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
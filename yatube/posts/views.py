@@ -1,65 +1,86 @@
+import json
+
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db import IntegrityError
+from django.db import transaction
+from django.http import (Http404, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_POST, require_safe
+
+from notifications.notify import mark_read
+from users.models import Profile
 
+from .cache import feed_cache_context, is_following
+from .conditional import (conditional_page, group_version, index_version,
+                          post_version, profile_version)
+from .exports import (FORMATS, TABLES, export_chunks, gzip_chunks,
+                      parse_timestamp)
+from .follows import follow, unfollow
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Group, Post, User
+from .paginators import paginate
+from .search import search_posts
+from .thumbnails import schedule_thumbnail
+from .timeline import timeline_posts
 
 
+@conditional_page(index_version)
 def index(request):
     """Passes the last ten Post model objects and title."""
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.PAGINATOR_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    page_obj = paginate(request, post_list)
     context = {
         'page_obj': page_obj,
+        **feed_cache_context('index', page_obj),
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_version)
 def group_posts(request, slug):
     """Passes the last ten Post model objects
     filtered by group field and title."""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.community.all()
-    paginator = Paginator(post_list, settings.PAGINATOR_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.community.feed()
+    page_obj = paginate(request, post_list)
     context = {
         'group': group,
         'page_obj': page_obj,
-        'title': group.title
+        'title': group.title,
+        **feed_cache_context(f'group:{group.pk}', page_obj),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_version)
 def profile(request, username):
     """All posts author."""
     author = get_object_or_404(User, username=username)
-    post_list = author.author_posts.all()
-    paginator = Paginator(post_list, settings.PAGINATOR_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = author.author_posts.feed()
+    page_obj = paginate(request, post_list)
     title = f'Профайл пользователя {author}'
-    following = author.following.all()
+    counters = Profile.objects.for_user(author)
     context = {
-        'post_list': post_list,
+        'post_count': counters.post_count,
+        'follower_count': counters.follower_count,
+        'following_count': counters.following_count,
         'page_obj': page_obj,
         'author': author,
         'title': title,
-        'following': following
+        'following': is_following(request.user, author),
+        **feed_cache_context(f'profile:{author.pk}', page_obj),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_page(post_version)
 def post_detail(request, post_id):
     """Post details."""
-    post = get_object_or_404(Post, pk=post_id)
-    post_count = Post.objects.filter(author=post.author)
-    post_comments = post.comments.all()
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    post_count = Profile.objects.for_user(post.author).post_count
     title = f'Пост {post.text[:30]}'
     form = CommentForm()
     context = {
@@ -67,11 +88,59 @@ def post_detail(request, post_id):
         'title': title,
         'post_count': post_count,
         'form': form,
-        'comments': post_comments
+        'comments': comment_page(request, post.pk),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comment_page(request, post_id):
+    """Comments of a post in the order of writing, by cursor pages."""
+    comment_list = Comment.objects.filter(
+        post_id=post_id).select_related('author')
+    return paginate(request, comment_list, ordering=('created', 'pk'),
+                    per_page=settings.COMMENTS_PER_PAGE)
+
+
+def post_comments(request, post_id):
+    """The next comments as JSON for the "load more" button."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    page = comment_page(request, post_id)
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'author_url': reverse(
+                    'posts:profile', args=[comment.author.username]),
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            }
+            for comment in page
+        ],
+        'next': page.next_token,
+    })
+
+
+def discussed(request):
+    """Posts with the most comments first."""
+    post_list = Post.objects.feed()
+    page_obj = paginate(request, post_list,
+                        ordering=('-comment_count', '-pk'))
+    return render(request, 'posts/discussed.html', {'page_obj': page_obj})
+
+
+def search(request):
+    """Posts found by the words of their text or comments."""
+    query = request.GET.get('q', '').strip()
+    post_list = search_posts(query).feed()
+    page_obj = paginate(request, post_list)
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     """Create post."""
@@ -82,6 +151,8 @@ def post_create(request):
             post = form.save(commit=False)
             post.author_id = request.user.id
             post.save()
+            if post.image:
+                schedule_thumbnail(post)
             return redirect(f'/profile/{request.user.username}/')
         return render(request, 'posts/create_post.html', {'form': form})
     context = {
@@ -100,7 +171,12 @@ def post_edit(request, post_id):
                     instance=post)
     if request.method == 'POST':
         if form.is_valid():
+            image_changed = 'image' in form.changed_data
+            if image_changed:
+                post.thumbnail = ''
             form.save()
+            if image_changed and post.image:
+                schedule_thumbnail(post)
             return redirect(f'/posts/{post.pk}/')
     context = {
         'form': form,
@@ -123,13 +199,10 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    """All author subscriptions."""
-    user = request.user
-    author_follow = user.follower.values_list('author', flat=True)
-    post_list = Post.objects.filter(author__in=author_follow)
-    paginator = Paginator(post_list, settings.PAGINATOR_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    """All author subscriptions; their new posts count as read."""
+    mark_read(request.user)
+    post_list = timeline_posts(request.user)
+    page_obj = paginate(request, post_list)
     context = {
         'page_obj': page_obj,
     }
@@ -139,15 +212,8 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     """Add subscription."""
-    user = request.user
     author = get_object_or_404(User, username=username)
-    try:
-        Follow.objects.create(
-            user=user,
-            author=author
-        ).save()
-    except IntegrityError:
-        return redirect('posts:follow_index')
+    follow(request.user, [author])
     return redirect('posts:follow_index')
 
 
@@ -155,6 +221,80 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     """Delete subscription."""
     author = get_object_or_404(User, username=username)
-    get_object_or_404(Follow, user=request.user, author=author)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    if not unfollow(request.user, [author]):
+        raise Http404('Подписка не найдена')
     return redirect('posts:follow_index')
+
+
+@require_POST
+@login_required
+def follow_batch(request):
+    """Follows and unfollows many authors at once.
+
+    Takes {"follow": [username, ...], "unfollow": [username, ...]} and
+    answers with the changed and the unknown usernames.
+    """
+    try:
+        data = json.loads(request.body)
+        names = {
+            action: data.get(action, []) for action in ('follow', 'unfollow')
+        }
+    except (ValueError, AttributeError):
+        names = None
+    if names is None or not all(
+        isinstance(value, list)
+        and all(isinstance(name, str) for name in value)
+        for value in names.values()
+    ):
+        return JsonResponse(
+            {'error': 'Ожидаются списки имён follow и unfollow.'},
+            status=400)
+    if sum(map(len, names.values())) > settings.FOLLOW_BATCH_LIMIT:
+        return JsonResponse(
+            {'error': f'Не больше {settings.FOLLOW_BATCH_LIMIT} авторов.'},
+            status=400)
+    users = User.objects.filter(
+        username__in=names['follow'] + names['unfollow']).only(
+            'pk', 'username')
+    by_name = {user.username: user for user in users}
+    by_id = {user.pk: user.username for user in users}
+    with transaction.atomic():
+        followed = follow(request.user, [
+            by_name[name] for name in names['follow'] if name in by_name])
+        unfollowed = unfollow(request.user, [
+            by_name[name] for name in names['unfollow'] if name in by_name])
+    return JsonResponse({
+        'followed': [by_id[pk] for pk in followed],
+        'unfollowed': [by_id[pk] for pk in unfollowed],
+        'missing': sorted(
+            {*names['follow'], *names['unfollow']} - by_name.keys()),
+        'following_count': Profile.objects.for_user(
+            request.user).following_count,
+    })
+
+
+@require_safe
+@staff_member_required
+def export(request, table):
+    """Streams a table as CSV or JSON lines for the staff."""
+    fmt = request.GET.get('format', 'csv')
+    if table not in TABLES or fmt not in FORMATS:
+        raise Http404
+    # everything is checked before the response starts streaming
+    since = request.GET.get('since') or None
+    try:
+        if since is not None:
+            since = parse_timestamp(since)
+        chunks = export_chunks(
+            table, fmt, since, settings.EXPORT_BATCH_SIZE)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    filename = f'{table}.{fmt}'
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    if request.GET.get('gzip'):
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        content_type = 'application/gzip'
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
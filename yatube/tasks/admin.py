@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.contrib import admin, messages
+from django.utils import timezone
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'attempts', 'max_attempts',
+                    'run_at', 'locked_by', 'created', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = [field.name for field in Task._meta.fields]
+    actions = ('retry',)
+    empty_value_display = settings.EMPTY_VALUE_DISPLAY
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        """Queues failed tasks again with fresh attempts."""
+        count = queryset.filter(status=Task.FAILED).update(
+            status=Task.QUEUED, attempts=0, run_at=timezone.now(),
+            finished_at=None)
+        self.message_user(
+            request, f'Задач снова в очереди: {count}.', messages.SUCCESS)
+    retry.short_description = 'Запустить заново'
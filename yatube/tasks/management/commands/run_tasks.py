@@ -0,0 +1,73 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tasks.models import Task
+from tasks.queue import claim, execute, release, worker_name
+
+
+class Command(BaseCommand):
+    help = ('Runs queued tasks; start as many workers on as many hosts '
+            'as needed, each task is claimed by one of them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no task is due instead of polling.')
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Seconds to wait when no task is due.')
+        parser.add_argument(
+            '--batch', type=int, default=10,
+            help='Tasks claimed at once.')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        handlers = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            self.work(options)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+    def work(self, options):
+        worker = worker_name()
+        self.stdout.write(f'Worker {worker} started.')
+        done = failed = 0
+        while not self.stopping:
+            close_old_connections()
+            claimed = claim(worker, limit=options['batch'])
+            if not claimed:
+                if options['burst']:
+                    break
+                time.sleep(options['poll'])
+                continue
+            for number, task in enumerate(claimed):
+                if self.stopping:
+                    # the rest goes back to the queue at once, not
+                    # after the lease
+                    release(claimed[number:])
+                    break
+                started = time.perf_counter()
+                succeeded = execute(task)
+                elapsed = (time.perf_counter() - started) * 1000
+                if succeeded:
+                    done += 1
+                else:
+                    failed += 1
+                status = Task.objects.values_list(
+                    'status', flat=True).get(pk=task.pk)
+                self.stdout.write(
+                    f'{task}: {status}, {elapsed:.0f} ms, attempt '
+                    f'{task.attempts} of {task.max_attempts}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Worker {worker} stopped: {done} done, {failed} failed.'))
+
+    def stop(self, signum, frame):
+        """Finishes the running task, then exits."""
+        self.stopping = True
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:59
+
+import datetime
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='function')),
+                ('args', models.TextField(default='[]', verbose_name='JSON arguments')),
+                ('kwargs', models.TextField(default='{}', verbose_name='JSON keyword arguments')),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='queued', max_length=16, verbose_name='status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='attempts')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='max attempts')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='not before')),
+                ('timeout', models.DurationField(default=datetime.timedelta(seconds=300), verbose_name='lease')),
+                ('locked_by', models.CharField(blank=True, max_length=255, verbose_name='worker')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='lease end')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='time of creation')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='time of finish')),
+            ],
+            options={
+                'verbose_name': 'task',
+                'db_table': 'tasks',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'run_at'], name='task_status_run_at'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Call of a registered function waiting for a worker."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'queued'),
+        (RUNNING, 'running'),
+        (DONE, 'done'),
+        (FAILED, 'failed'),
+    )
+    name = models.CharField('function', max_length=255)
+    args = models.TextField('JSON arguments', default='[]')
+    kwargs = models.TextField('JSON keyword arguments', default='{}')
+    status = models.CharField(
+        'status', max_length=16, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField('attempts', default=0)
+    max_attempts = models.PositiveIntegerField('max attempts', default=5)
+    run_at = models.DateTimeField('not before', default=timezone.now)
+    # a running task whose lease ran out is claimed again
+    timeout = models.DurationField('lease', default=timedelta(minutes=5))
+    locked_by = models.CharField('worker', max_length=255, blank=True)
+    locked_until = models.DateTimeField('lease end', null=True, blank=True)
+    last_error = models.TextField('last error', blank=True)
+    created = models.DateTimeField('time of creation', auto_now_add=True)
+    finished_at = models.DateTimeField(
+        'time of finish', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'task'
+        db_table = 'tasks'
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='task_status_run_at'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
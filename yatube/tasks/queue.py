@@ -0,0 +1,161 @@
+import json
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DateTimeField, ExpressionWrapper, F, Q, Value
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+
+def task(func=None, *, max_attempts=5, timeout=300):
+    """Makes a function a task: ``func.delay(*args, **kwargs)`` queues it.
+
+    Arguments must be JSON serializable. ``timeout`` is the lease of a
+    worker in seconds: a task still running after it is given to
+    another worker, so tasks must be safe to run twice.
+    """
+    def register(func):
+        func.task_options = {
+            'max_attempts': max_attempts,
+            'timeout': timeout,
+        }
+        func.delay = partial(enqueue, func)
+        return func
+
+    return register if func is None else register(func)
+
+
+def enqueue(func, *args, **kwargs):
+    """Queues a call of a task in the current transaction."""
+    queued = Task.objects.create(
+        name=f'{func.__module__}.{func.__qualname__}',
+        args=json.dumps(args),
+        kwargs=json.dumps(kwargs),
+        max_attempts=func.task_options['max_attempts'],
+        timeout=timedelta(seconds=func.task_options['timeout']),
+    )
+    if settings.TASKS_EAGER:
+        transaction.on_commit(partial(run_task, queued.pk))
+    return queued
+
+
+def resolve(name):
+    """The task function of a queued name; only tasks can be run."""
+    func = import_string(name)
+    if not hasattr(func, 'task_options'):
+        raise ImportError(f'{name} is not a task.')
+    return func
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def due(now):
+    """Queued tasks whose time has come and tasks of lost workers that
+    have attempts left."""
+    return (Q(status=Task.QUEUED, run_at__lte=now)
+            | Q(status=Task.RUNNING, locked_until__lt=now,
+                attempts__lt=F('max_attempts')))
+
+
+def owned(claimed):
+    """The row of a claimed task while its worker still holds it."""
+    return Task.objects.filter(
+        pk=claimed.pk, status=Task.RUNNING, locked_by=claimed.locked_by)
+
+
+def claim(worker, limit=1, pk=None):
+    """Locks up to ``limit`` due tasks for the worker and returns them.
+
+    The UPDATE only takes rows that are still due, so two workers never
+    get the same task. PostgreSQL and MySQL read the candidates with
+    SKIP LOCKED; SQLite gets a single UPDATE, which takes the write lock
+    at once instead of failing to upgrade the read lock of a SELECT.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # a lost worker had the last attempt
+        Task.objects.filter(
+            status=Task.RUNNING, locked_until__lt=now,
+            attempts__gte=F('max_attempts'),
+        ).update(status=Task.FAILED, locked_until=None, finished_at=now,
+                 last_error='The lease ran out on the last attempt.')
+        candidates = Task.objects.filter(due(now)).order_by('run_at', 'pk')
+        if pk is not None:
+            candidates = candidates.filter(pk=pk)
+        if connection.features.has_select_for_update_skip_locked:
+            ids = list(candidates.select_for_update(skip_locked=True)
+                       .values_list('pk', flat=True)[:limit])
+        else:
+            ids = candidates.values('pk')[:limit]
+        Task.objects.filter(due(now), pk__in=ids).update(
+            status=Task.RUNNING,
+            locked_by=worker,
+            locked_until=ExpressionWrapper(
+                Value(now) + F('timeout'), output_field=DateTimeField()),
+            attempts=F('attempts') + 1,
+        )
+        # a worker runs what it claimed before it claims again
+        return list(Task.objects.filter(
+            status=Task.RUNNING, locked_by=worker, locked_until__gt=now)
+            .order_by('run_at', 'pk'))
+
+
+def backoff(attempts):
+    """Seconds before the next attempt: doubles, with jitter."""
+    delay = min(settings.TASKS_RETRY_BACKOFF * 2 ** (attempts - 1),
+                settings.TASKS_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def execute(claimed):
+    """Runs a claimed task; a failure is retried later or given up.
+
+    The outcome is only stored while the worker still holds the task:
+    once its lease ran out the task belongs to whoever claimed it next.
+    Returns True when the task succeeded.
+    """
+    try:
+        func = resolve(claimed.name)
+        func(*json.loads(claimed.args), **json.loads(claimed.kwargs))
+    except Exception:
+        error = traceback.format_exc()
+        if claimed.attempts < claimed.max_attempts:
+            owned(claimed).update(
+                status=Task.QUEUED, last_error=error, locked_until=None,
+                run_at=timezone.now() + timedelta(
+                    seconds=backoff(claimed.attempts)))
+        else:
+            owned(claimed).update(
+                status=Task.FAILED, last_error=error, locked_until=None,
+                finished_at=timezone.now())
+        return False
+    owned(claimed).update(
+        status=Task.DONE, locked_until=None, finished_at=timezone.now())
+    return True
+
+
+def release(tasks):
+    """Gives claimed tasks back without counting the attempt."""
+    Task.objects.filter(
+        pk__in=[claimed.pk for claimed in tasks], status=Task.RUNNING,
+        locked_by__in={claimed.locked_by for claimed in tasks},
+    ).update(
+        status=Task.QUEUED, locked_until=None,
+        attempts=F('attempts') - 1)
+
+
+def run_task(pk):
+    """Runs one task now in this thread if it is still due."""
+    for claimed in claim(worker_name(), pk=pk):
+        execute(claimed)
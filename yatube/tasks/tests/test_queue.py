@@ -0,0 +1,139 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import Task
+from ..queue import claim, execute, release, task
+
+calls = []
+
+
+@task
+def remember(value, twice=False):
+    calls.extend([value] * (2 if twice else 1))
+
+
+@task(max_attempts=2, timeout=60)
+def fail():
+    raise RuntimeError('Broken task')
+
+
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_stores_the_call(self):
+        """delay() queues the name and the JSON arguments of the call."""
+        queued = remember.delay('a', twice=True)
+        self.assertEqual(
+            (queued.name, queued.args, queued.kwargs, queued.status),
+            ('tasks.tests.test_queue.remember', '["a"]', '{"twice": true}',
+             Task.QUEUED))
+        self.assertEqual(fail.delay().timeout, timedelta(seconds=60))
+        self.assertEqual(calls, [])
+
+    def test_claimed_task_is_not_given_to_another_worker(self):
+        """A task is leased to one worker at a time."""
+        queued = remember.delay('a')
+        self.assertEqual(claim('first'), [queued])
+        self.assertEqual(claim('second'), [])
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.locked_by, queued.attempts),
+                         (Task.RUNNING, 'first', 1))
+        self.assertGreater(queued.locked_until, timezone.now())
+
+    def test_task_of_lost_worker_is_claimed_again(self):
+        """Once the lease runs out another worker takes the task."""
+        queued = remember.delay('a')
+        claim('lost')
+        Task.objects.filter(pk=queued.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        claimed = claim('second')
+        self.assertEqual(
+            [(task.pk, task.locked_by, task.attempts) for task in claimed],
+            [(queued.pk, 'second', 2)])
+
+    def test_lost_worker_leaves_the_new_owner_alone(self):
+        """A worker finishing after its lease ran out stores nothing."""
+        queued = remember.delay('a')
+        lost = claim('lost')[0]
+        Task.objects.filter(pk=queued.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        claim('second')
+        self.assertTrue(execute(lost))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.locked_by),
+                         (Task.RUNNING, 'second'))
+
+    def test_lost_last_attempt_fails_the_task(self):
+        """A lost lease counts towards max_attempts."""
+        queued = fail.delay()
+        for worker in ('first', 'second'):
+            self.assertEqual(len(claim(worker)), 1)
+            Task.objects.filter(pk=queued.pk).update(
+                locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim('third'), [])
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts),
+                         (Task.FAILED, 2))
+
+    def test_future_tasks_wait(self):
+        """A task is not claimed before its run_at."""
+        Task.objects.filter(pk=remember.delay('a').pk).update(
+            run_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(claim('worker'), [])
+
+    def test_execute_runs_the_function(self):
+        queued = remember.delay('a', twice=True)
+        self.assertTrue(execute(claim('worker')[0]))
+        queued.refresh_from_db()
+        self.assertEqual(calls, ['a', 'a'])
+        self.assertEqual(queued.status, Task.DONE)
+        self.assertIsNotNone(queued.finished_at)
+
+    @override_settings(TASKS_RETRY_BACKOFF=100)
+    def test_failed_task_is_retried_later_then_given_up(self):
+        """A failure is retried with backoff until max_attempts."""
+        queued = fail.delay()
+        self.assertFalse(execute(claim('worker')[0]))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertIn('RuntimeError: Broken task', queued.last_error)
+        self.assertGreater(
+            queued.run_at, timezone.now() + timedelta(seconds=40))
+        self.assertEqual(claim('worker'), [])
+        Task.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        self.assertFalse(execute(claim('worker')[0]))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts),
+                         (Task.FAILED, 2))
+
+    def test_only_tasks_are_run(self):
+        """A queued name that is no task fails instead of being called."""
+        Task.objects.create(name='os.remove', args='["/tmp/x"]',
+                            max_attempts=1)
+        self.assertFalse(execute(claim('worker')[0]))
+        self.assertIn('is not a task',
+                      Task.objects.get().last_error)
+
+    def test_release_does_not_count_the_attempt(self):
+        queued = remember.delay('a')
+        release(claim('worker'))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Task.QUEUED, 0))
+        self.assertEqual(len(claim('worker')), 1)
+
+    def test_burst_worker_runs_due_tasks(self):
+        """run_tasks --burst works off the queue and exits."""
+        for value in 'abc':
+            remember.delay(value)
+        fail.delay()
+        out = StringIO()
+        call_command('run_tasks', burst=True, batch=2, stdout=out)
+        self.assertEqual(calls, ['a', 'b', 'c'])
+        self.assertEqual(
+            Task.objects.filter(status=Task.DONE).count(), 3)
+        self.assertIn('3 done, 1 failed', out.getvalue())
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from notifications.models import Notification
+from posts.models import Follow, Post
+from users.models import Profile, User
+
+
+def count(rows, field):
+    """Rows whose ``field`` is the user, as a correlated subquery.
+
+    Each counter is its own subquery: joining all the tables in one
+    GROUP BY would multiply their rows per user.
+    """
+    return Coalesce(Subquery(
+        rows.filter(**{field: OuterRef('pk')}).order_by().values(field)
+        .annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the denormalized counters of every user.'
+    counters = ['post_count', 'follower_count', 'following_count',
+                'unread_count']
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Users processed per transaction.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        total = 0
+        while True:
+            users = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk')
+                .annotate(
+                    post_count=count(Post.objects, 'author'),
+                    follower_count=count(Follow.objects, 'author'),
+                    following_count=count(Follow.objects, 'user'),
+                    unread_count=count(
+                        Notification.objects.filter(read=False), 'user'))
+                .values_list('pk', *self.counters)[:batch_size]
+            )
+            if not users:
+                break
+            last_pk = users[-1][0]
+            with transaction.atomic():
+                self.rebuild(users)
+            total += len(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Counters rebuilt for {total} users.'))
+
+    def rebuild(self, users):
+        profiles = Profile.objects.select_for_update().in_bulk(
+            [user[0] for user in users], field_name='user_id')
+        missing = []
+        for user_id, *counts in users:
+            values = dict(zip(self.counters, counts))
+            profile = profiles.get(user_id)
+            if profile is None:
+                missing.append(Profile(user_id=user_id, **values))
+            else:
+                for field, value in values.items():
+                    setattr(profile, field, value)
+        Profile.objects.bulk_update(profiles.values(), self.counters)
+        Profile.objects.bulk_create(missing)
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_followers(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Profile = apps.get_model('users', 'Profile')
+    followers = (
+        Follow.objects.filter(author=OuterRef('user'))
+        .values('author').annotate(total=Count('pk')).values('total')
+    )
+    Profile.objects.update(
+        follower_count=Coalesce(Subquery(followers), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('posts', '0008_auto_20211220_0749'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='follower count'),
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_following(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Profile = apps.get_model('users', 'Profile')
+    following = (
+        Follow.objects.filter(user=OuterRef('user'))
+        .values('user').annotate(total=Count('pk')).values('total')
+    )
+    Profile.objects.update(
+        following_count=Coalesce(Subquery(following), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_profile_follower_count'),
+        ('posts', '0019_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='following count'),
+        ),
+        migrations.RunPython(count_following, migrations.RunPython.noop),
+    ]
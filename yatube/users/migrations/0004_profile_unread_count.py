@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_profile_following_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='unread notification count'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.db.models import F
+
+User = get_user_model()
+
+
+class ProfileManager(models.Manager):
+    def counts(self, user):
+        """Counters of the user computed from the tables."""
+        return {
+            'post_count': user.author_posts.count(),
+            'follower_count': user.following.count(),
+            'following_count': user.follower.count(),
+            'unread_count': user.notifications.filter(read=False).count(),
+        }
+
+    def for_user(self, user):
+        """Returns the profile of the user, creating a missing one."""
+        try:
+            return self.get(user=user)
+        except self.model.DoesNotExist:
+            profile, _ = self.get_or_create(
+                user=user, defaults=self.counts(user))
+            return profile
+
+    def bump(self, user_id, field, delta=1):
+        """Moves a counter by delta in the database.
+
+        A missing profile is left alone: it is built from the tables
+        the first time it is read.
+        """
+        return self.filter(user_id=user_id).update(
+            **{field: F(field) + delta})
+
+    def bump_many(self, user_ids, field, delta=1):
+        """bump() for several users in one UPDATE."""
+        return self.filter(user_id__in=user_ids).update(
+            **{field: F(field) + delta})
+
+
+class Profile(models.Model):
+    """Denormalized counters of the user."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='user',
+        related_name='profile')
+    post_count = models.PositiveIntegerField('post count', default=0)
+    follower_count = models.PositiveIntegerField(
+        'follower count', default=0)
+    following_count = models.PositiveIntegerField(
+        'following count', default=0)
+    unread_count = models.PositiveIntegerField(
+        'unread notification count', default=0)
+
+    objects = ProfileManager()
+
+    class Meta:
+        verbose_name = 'profile'
+
+    def __str__(self):
+        return f'profile of {self.user}'
@@ -1,4 +1,4 @@
-from os import path
+from os import environ, path
 
 BASE_DIR = path.dirname(path.dirname(path.abspath(__file__)))
 
@@ -24,6 +24,10 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
+    'tasks.apps.TasksConfig',
+    'mailer.apps.MailerConfig',
+    'notifications.apps.NotificationsConfig',
     'sorl.thumbnail',
 ]
 
@@ -99,18 +103,73 @@ MEDIA_ROOT = path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-CACHES = {
-    'default': {
+# locmem is private to a process, file and sqlite are shared by all the
+# workers of a host: YATUBE_CACHE=sqlite in multi-process deployments
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': path.join(BASE_DIR, 'cache'),
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': path.join(BASE_DIR, 'cache.sqlite3'),
+    },
+}
+CACHES = {
+    'default': CACHE_BACKENDS[environ.get('YATUBE_CACHE', 'locmem')],
 }
+# seconds another worker may spend recomputing a key before it is retried
+CACHE_LOCK_TIMEOUT = 10
+# seconds an expired value is still served while it is being recomputed
+CACHE_STALE_TIMEOUT = 60
+# larger values recompute earlier before expiry, 0 disables it
+CACHE_EARLY_EXPIRY_BETA = 1.0
 
 EMPTY_VALUE_DISPLAY = '-пусто-'
 PAGINATOR_COUNT = 10
+COMMENTS_PER_PAGE = 20
+# ids of deleted posts per page of the API changes
+API_DELETED_PER_PAGE = 1000
+FEED_CACHE_TIMEOUT = 60 * 15
+# seconds browsers and proxies reuse an anonymous page unrevalidated
+PAGE_CACHE_MAX_AGE = 60
+FOLLOW_CACHE_TIMEOUT = 60 * 60
+TIMELINE_FANOUT_LIMIT = 10000
+TIMELINE_BACKFILL = 200
+FOLLOW_BATCH_LIMIT = 100
+# admin changelists count rows exactly up to this many
+ADMIN_EXACT_COUNT_LIMIT = 10000
+# posts per transaction of a bulk moderation job
+MODERATION_CHUNK_SIZE = 500
+# followers notified per transaction of a new post
+NOTIFICATION_BATCH_SIZE = 1000
+# posts listed in a digest mail
+NOTIFICATION_DIGEST_LIMIT = 20
+# links in mail sent outside of a request
+SITE_URL = 'http://localhost:8000'
+# rows read per query by the streaming exports
+EXPORT_BATCH_SIZE = 2000
+POST_THUMBNAIL_GEOMETRY = '960x339'
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+# 'fts5', 'python' or 'auto': FTS5 on SQLite, the Python index elsewhere
+SEARCH_BACKEND = 'auto'
+# tasks run in the request after the commit instead of in a worker
+TASKS_EAGER = False
+# seconds before the first retry of a failed task, doubled every attempt
+TASKS_RETRY_BACKOFF = 10
+TASKS_RETRY_BACKOFF_MAX = 60 * 60
 
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# requests only queue mail, manage.py send_queued_mail delivers it
+EMAIL_BACKEND = 'mailer.backends.QueuedEmailBackend'
+MAILER_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# seconds a sender holds a message before another may send it
+MAILER_LEASE = 60 * 5
+MAILER_MAX_ATTEMPTS = 5
 EMAIL_FILE_PATH = path.join(BASE_DIR, 'sent_emails')